@@ -44,6 +44,9 @@ setup(
             "flake8",
             "mypy",
         ],
+        "speedups": [
+            "orjson>=3.8.0",
+        ],
     },
     entry_points={
         "console_scripts": [
@@ -9,15 +9,19 @@ __version__ = "1.0.0"
 __author__ = "Alex Wallar"
 __email__ = "alex@wallar.me"
 
-from .planner import (create_default_profile, create_geojson, generate_trip_plan, get_multi_waypoint_directions,
-                      initialize_clients, plan_tour_itinerary, revise_trip_plan_with_feedback)
+from .planner import (create_default_profile, create_geojson, generate_trip_plan, generate_trip_plan_async,
+                      get_multi_waypoint_directions, initialize_clients, plan_tour_itinerary, plan_tour_itinerary_async,
+                      revise_trip_plan_with_feedback, revise_trip_plan_with_feedback_async)
 
 __all__ = [
     "create_default_profile",
     "create_geojson",
     "generate_trip_plan",
+    "generate_trip_plan_async",
     "get_multi_waypoint_directions",
     "initialize_clients",
     "plan_tour_itinerary",
+    "plan_tour_itinerary_async",
     "revise_trip_plan_with_feedback",
+    "revise_trip_plan_with_feedback_async",
 ]
@@ -0,0 +1,171 @@
+"""
+Persistent response caches for DirtGenie.
+
+Geocoding results and other API responses are stable enough to reuse across runs,
+so they are kept in a small SQLite database under the user's home directory.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+try:
+    import orjson  # Optional: faster (de)serialization of cached payloads
+except ImportError:
+    orjson = None
+
+# Directory holding the cache databases (override with DIRTGENIE_CACHE_DIR)
+CACHE_DIR = Path(os.getenv("DIRTGENIE_CACHE_DIR", str(Path.home() / ".dirtgenie")))
+
+# Set DIRTGENIE_DISABLE_CACHE=1 to bypass all persistent caches
+CACHE_DISABLED = os.getenv("DIRTGENIE_DISABLE_CACHE", "").lower() in ("1", "true", "yes")
+
+
+def _dumps(value: Any) -> str:
+    """Serialize a cache value to JSON text."""
+    if orjson is not None:
+        return orjson.dumps(value).decode("utf-8")
+    return json.dumps(value)
+
+
+class DiskCache:
+    """
+    SQLite-backed key/value cache with an in-memory LRU front and per-entry expiry.
+
+    Values must be JSON serializable. The database is opened lazily on first use and
+    access is serialized with a lock, so one instance can be shared across threads.
+    Expired entries are never returned, and expired rows are deleted when the database
+    is opened and then at most once per TTL period by set(). If the database can't be
+    opened (e.g. CACHE_DIR isn't writable), the cache warns once and keeps entries in
+    memory only.
+    """
+
+    def __init__(self, name: str, ttl_seconds: Optional[float] = None, maxsize: int = 1024):
+        """
+        Args:
+            name: Cache name, used as the database file name inside CACHE_DIR
+            ttl_seconds: Entry lifetime in seconds, or None to keep entries forever
+            maxsize: Number of entries kept in the in-memory LRU
+        """
+        self.path = CACHE_DIR / f"{name}.sqlite"
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        # Maps each key to (value, created) so memory hits respect the TTL too
+        self._memory: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._purged_at = 0.0
+        self._disk_unavailable = False
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """Return the open database, or None once it has failed to open."""
+        if self._conn is None and not self._disk_unavailable:
+            conn = None
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self.path), check_same_thread=False)
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS cache "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+                )
+                self._conn = conn
+                self._purge_expired()
+            except (sqlite3.Error, OSError) as e:
+                print(f"Warning: Could not open cache {self.path}, caching in memory only: {e}")
+                if conn is not None:
+                    conn.close()
+                self._conn = None
+                self._disk_unavailable = True
+        return self._conn
+
+    def _purge_expired(self) -> None:
+        # Rows are otherwise never removed, so the file would grow without bound
+        if self.ttl_seconds is None or self._conn is None:
+            return
+        now = time.time()
+        self._conn.execute("DELETE FROM cache WHERE created < ?", (now - self.ttl_seconds,))
+        self._conn.commit()
+        self._purged_at = now
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def _remember(self, key: str, value: Any, created: float) -> None:
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if it is missing or expired."""
+        if CACHE_DISABLED:
+            return None
+
+        with self._lock:
+            if key in self._memory:
+                value, created = self._memory[key]
+                if not self._expired(created):
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+
+            conn = self._connection()
+            if conn is None:
+                return None
+
+            try:
+                row = conn.execute(
+                    "SELECT value, created FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not read cache {self.path}: {e}")
+                return None
+
+            if row is None:
+                return None
+
+            value, created = row
+            if self._expired(created):
+                return None
+
+            try:
+                value = orjson.loads(value) if orjson is not None else json.loads(value)
+            except ValueError as e:
+                print(f"Warning: Ignoring unreadable cache entry in {self.path}: {e}")
+                return None
+            self._remember(key, value, created)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store value under key."""
+        if CACHE_DISABLED:
+            return
+
+        with self._lock:
+            created = time.time()
+            self._remember(key, value, created)
+            conn = self._connection()
+            if conn is None:
+                return
+
+            try:
+                payload = _dumps(value)
+            except (TypeError, ValueError) as e:
+                print(f"Warning: Not writing unserializable value to cache {self.path}: {e}")
+                return
+
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)",
+                    (key, payload, created),
+                )
+                conn.commit()
+                if self.ttl_seconds is not None and created - self._purged_at > self.ttl_seconds:
+                    self._purge_expired()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not write cache {self.path}: {e}")
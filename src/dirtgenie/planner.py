@@ -7,29 +7,79 @@ with route information from Google Maps.
 """
 
 import argparse
+import asyncio
+import copy
+import functools
+import hashlib
 import json
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import googlemaps
 import polyline  # For decoding Google Maps polylines
+import requests
 import yaml  # For loading profile configurations
-from openai import OpenAI
+from requests.adapters import HTTPAdapter
+
+if TYPE_CHECKING:
+    # The OpenAI SDK is slow to import, so it is only loaded when a client is created
+    from openai import AsyncOpenAI, OpenAI
+
+try:
+    import orjson  # Optional: faster JSON parsing of API responses
+except ImportError:
+    orjson = None
+
+try:
+    import numpy as np  # Optional: vectorized polyline decoding
+except ImportError:
+    np = None
+
+try:
+    from dotenv import load_dotenv  # Optional: full .env syntax support
+except ImportError:
+    load_dotenv = None
+
+try:
+    # Try absolute import first (when package is installed)
+    from dirtgenie.cache import DiskCache
+except ImportError:
+    # Fall back to relative import (when running directly)
+    from .cache import DiskCache
+
+
+# Paths of .env files already loaded by load_env()
+_loaded_env_files: set = set()
 
 
 # Load environment variables from .env file if it exists
 def load_env():
-    """Load environment variables from .env file if it exists."""
-    env_file = Path(".env")
-    if env_file.exists():
-        with open(env_file, "r") as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith("#") and "=" in line:
-                    key, value = line.split("=", 1)
-                    os.environ[key.strip()] = value.strip()
+    """
+    Load environment variables from .env file if it exists.
+
+    Each file is only read once per process, so modules that call this on import don't
+    parse it again. Uses python-dotenv when it is installed, which also handles quoting.
+    """
+    env_file = Path(".env").resolve()
+    if env_file in _loaded_env_files or not env_file.exists():
+        return
+    _loaded_env_files.add(env_file)
+
+    if load_dotenv is not None:
+        load_dotenv(env_file, override=True)
+        return
+
+    with open(env_file, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                key, value = line.split("=", 1)
+                os.environ[key.strip()] = value.strip()
 
 
 # Load environment variables
@@ -39,29 +89,377 @@ load_env()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 
+# Models for the structured itinerary JSON and for the written trip plans
+PLAN_MODEL = os.getenv("DIRTGENIE_PLAN_MODEL", "gpt-4o-mini")
+WRITE_MODEL = os.getenv("DIRTGENIE_WRITE_MODEL", "gpt-4o")
+
+# Output token budget for the itinerary JSON, which grows with the number of days
+ITINERARY_BASE_TOKENS = 500
+ITINERARY_TOKENS_PER_DAY = 400
+ITINERARY_MAX_TOKENS = 4000
+
+# System messages are fixed so every request shares the same prompt prefix; all
+# per-trip details go in the user message
+ITINERARY_SYSTEM_PROMPT = (
+    "You are an expert bikepacking tour planner with access to current web "
+    "information. CRITICAL: You must respond with ONLY valid JSON exactly as "
+    "requested - no additional text, no markdown, no explanations outside the JSON. "
+    "Be extremely detailed within the JSON structure. IMPORTANT: Use your web search "
+    "capabilities to find current information about: 1) Specific accommodations "
+    "(campgrounds, hotels, hostels) with availability, pricing, and booking details, "
+    "2) Current weather forecasts for the planned travel dates and locations, 3) "
+    "Trail conditions and any closures, 4) Local attractions and their current "
+    "operating status. Search for real, specific places and current information. "
+    "Include MANY waypoints and detailed descriptions for each day. When planning "
+    "closed-loop tours, ensure the route forms a loop back to the start."
+)
+TRIP_PLAN_SYSTEM_PROMPT = (
+    "You are an expert bikepacking trip planner with extensive knowledge of cycling "
+    "routes, accommodations, and outdoor safety."
+)
+REVISION_SYSTEM_PROMPT = (
+    "You are an expert bikepacking trip planner. Revise the existing plan based on the "
+    "user's feedback while maintaining high quality and practical advice."
+)
+
+# Surface guidance by tire size, shared by the itinerary prompts
+_TIRE_SURFACE_RULES = """\
+- If tire size contains "23", "25", or "28mm": Prioritize paved roads, light gravel paths, and well-maintained bike paths
+- If tire size contains "32", "35", "40mm" or "650b": Good for mixed terrain - paved roads, gravel paths, and light trails
+- If tire size contains "2.1", "2.25", "2.35", or "2.8": Can handle mountain bike trails, singletrack, and rougher terrain
+- Always match route surface recommendations to tire capabilities for safety and comfort"""
+
+# Ratio of riding distance to straight-line distance assumed when checking that a
+# closed-loop stop can still be ridden home in the remaining days
+RETURN_DETOUR_FACTOR = 1.4
+
+# Fixed instructions for each kind of itinerary, sent after ITINERARY_SYSTEM_PROMPT in
+# the system message. Keeping every trip-specific value out of them makes the start of
+# each request byte-identical, so OpenAI's prompt caching can reuse the prefix.
+CLOSED_LOOP_ITINERARY_PROMPT = f"""
+Your job is to plan a CLOSED-LOOP TOUR itinerary - a route that starts and ends at the same location.
+
+IMPORTANT: Use web search to find current, up-to-date information about:
+- Campgrounds and accommodations (availability, booking info, current status)
+- Bike trails and cycling routes (conditions, closures, recent reviews)
+- Local bike shops and services along the route
+- Current weather patterns and seasonal considerations
+- Local events or festivals that might affect the trip
+- Recent cyclist reviews and recommendations for the area
+
+CRITICAL REQUIREMENTS FOR CLOSED-LOOP TOURS:
+1. **Every single day MUST be within the daily distance preference** - including the final return day
+2. **Plan a true loop, not out-and-back** - avoid going straight out and straight back
+3. **Maximum radius calculation** - the trip parameters give the maximum radius: how far from the start you can go as the crow flies with the available days and daily distance
+4. **Think circular/polygonal** - plan destinations that form a roughly circular or polygonal pattern around the start point
+5. **Balance the loop** - ensure you're never further than the maximum radius from home at any point
+
+ROUTE SURFACE AND TIRE COMPATIBILITY:
+Match the route surfaces to the tire size and terrain preference in the user preferences:
+{_TIRE_SURFACE_RULES}
+
+LOOP PLANNING STRATEGY:
+- **Maximum distance from start**: Stay within the maximum radius (straight-line distance)
+- **Loop geometry**: Plan waypoints that form a circle/polygon, not a line
+- **Progressive planning**: Each day should move you around the loop, not just away from start
+- **Return consideration**: Every waypoint should be positioned such that you can get home within the remaining days at the daily distance preference
+
+BEFORE PLANNING: Calculate if each overnight location can get you back to the start within the remaining days.
+Example: If it's day 3 of 6, and you're in location X, can you get from X back to the start in 3 days at the daily distance preference?
+
+Think of this as planning waypoints on a circle or polygon around the start, not a straight line out and back.
+
+Return the plan in this exact JSON format, with one entry per day ("day_1" to the last day):
+
+{{
+    "itinerary": {{
+        "day_1": {{
+            "start_location": "The start location",
+            "end_location": "Town/City within the low end of the daily distance of the start",
+            "overnight_location": "Specific accommodation name or camping area",
+            "highlights": ["attraction 1", "attraction 2"],
+            "estimated_distance_km": 50,
+            "distance_from_start_km": "Straight-line distance from the start",
+            "days_remaining_to_return": "Days left after this one"
+        }},
+        "day_2": {{
+            "start_location": "Previous end location",
+            "end_location": "Next waypoint continuing around the loop (not further from start)",
+            "overnight_location": "Specific accommodation name or camping area",
+            "highlights": ["attraction 1", "attraction 2"],
+            "estimated_distance_km": 60,
+            "distance_from_start_km": "Straight-line distance from the start",
+            "days_remaining_to_return": "Days left after this one"
+        }},
+        ...continue for every day; the last day ends back at the start...
+        "day_N": {{
+            "start_location": "Previous end location",
+            "end_location": "The start location",
+            "overnight_location": "Back home",
+            "highlights": ["final attractions", "return home"],
+            "estimated_distance_km": 50,
+            "distance_from_start_km": 0,
+            "days_remaining_to_return": 0
+        }}
+    }},
+    "total_estimated_distance": 300,
+    "route_summary": "Closed-loop tour starting and ending at the start location, with its max radius",
+    "validation_note": "Each overnight location verified to be returnable within remaining days at the daily distance"
+}}
+
+IMPORTANT: Every overnight location MUST be positioned such that:
+(distance_from_start_km * {RETURN_DETOUR_FACTOR}) <= (days_remaining_to_return * max_daily_distance)
+This ensures you can always get back within your daily distance constraints.
+
+SEARCH REQUIREMENTS:
+- Search for current weather forecasts for all planned locations and travel dates
+- Find specific, bookable accommodations with current availability and pricing
+- Verify trail conditions and any seasonal closures or restrictions
+- Look up local services and attractions with current operating information
+- Check for seasonal events, festivals, or special conditions during the planned travel period
+"""
+
+POINT_TO_POINT_ITINERARY_PROMPT = f"""
+Your job is to plan the ITINERARY first - determining the best places to visit and stay overnight.
+
+SEARCH REQUIREMENTS:
+- Search for current weather forecasts for all planned locations and travel dates
+- Find specific, bookable accommodations with current availability and pricing
+- Verify trail conditions and any seasonal closures or restrictions
+- Look up local services and attractions with current operating information
+- Check for seasonal events, festivals, or special conditions during the planned travel period
+
+PLANNING REQUIREMENTS:
+1. Identify the best intermediate destinations that make sense for a bikepacking tour
+2. Consider scenic routes, points of interest, accommodation availability
+3. Plan realistic daily segments based on terrain and fitness level - stay within the daily distance preference
+4. Choose specific towns/cities/landmarks as overnight stops
+5. Ensure progression toward the final destination
+
+ROUTE SURFACE AND TIRE COMPATIBILITY:
+Match the route surfaces to the tire size and terrain preference in the user preferences:
+{_TIRE_SURFACE_RULES}
+
+Return the plan in this exact JSON format with EXTENSIVE DETAIL, with one entry per day ("day_1" to the last day):
+
+{{
+    "itinerary": {{
+        "day_1": {{
+            "start_location": "The start location",
+            "end_location": "Specific Town/City Name",
+            "waypoints": [
+                "Waypoint 1 name (15km) - Description and services",
+                "Waypoint 2 name (35km) - Description and services",
+                "Waypoint 3 name (55km) - Description and services"
+            ],
+            "overnight_location": "Specific accommodation name with contact info",
+            "highlights": ["attraction 1 with details", "attraction 2 with details", "attraction 3 with details"],
+            "estimated_distance_km": 75,
+            "elevation_gain_m": 850,
+            "difficulty": "moderate",
+            "surface_types": "40km paved road, 25km gravel path, 10km dirt trail",
+            "food_stops": ["Restaurant Name at km 20", "Grocery Store at km 45"],
+            "water_sources": ["Public fountain at km 10", "Stream at km 30", "Town well at km 60"]
+        }},
+        "day_2": {{
+            "start_location": "Previous end location",
+            "end_location": "Next Town/City Name",
+            "waypoints": [
+                "Day 2 waypoint 1 (20km) - Description and services",
+                "Day 2 waypoint 2 (45km) - Description and services"
+            ],
+            "overnight_location": "Specific accommodation name with contact info",
+            "highlights": ["day 2 attraction 1 with details", "day 2 attraction 2 with details"],
+            "estimated_distance_km": 80,
+            "elevation_gain_m": 650,
+            "difficulty": "easy",
+            "surface_types": "50km paved road, 30km gravel path",
+            "food_stops": ["Food options for day 2"],
+            "water_sources": ["Water sources for day 2"]
+        }},
+        ...continue for every day with the same level of detail; the last day ends at the destination...
+        "day_N": {{
+            "start_location": "Previous end location",
+            "end_location": "The final destination",
+            "waypoints": ["Final day waypoints with descriptions"],
+            "overnight_location": "Arrive at destination",
+            "highlights": ["final day attractions with details"],
+            "estimated_distance_km": 65,
+            "elevation_gain_m": 400,
+            "difficulty": "moderate",
+            "surface_types": "final day surface breakdown",
+            "food_stops": ["final day food options"],
+            "water_sources": ["final day water sources"]
+        }}
+    }},
+    "total_estimated_distance": 400,
+    "total_elevation_gain": 2000,
+    "route_summary": "Comprehensive description of the overall route including terrain, highlights, and challenges",
+    "best_months": ["April", "May", "September", "October"],
+    "gear_recommendations": ["specific gear for this route"],
+    "emergency_contacts": ["relevant emergency contacts for the route area"],
+    "permits_required": ["any permits or fees needed"],
+    "difficulty_rating": "beginner/intermediate/advanced"
+}}
+
+Be specific with location names (include city, state/province). Choose real places that make sense for bikepacking.
+
+IMPORTANT: Use web search to find:
+1. Current weather forecasts for each location and planned travel dates
+2. Specific accommodations with real names, contact info, current availability and pricing
+3. Verify all locations and services are real and currently operating
+"""
+
+# libyaml's C dumper is much faster than the pure-Python one when PyYAML was built with it
+_YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
 # Initialize clients only if API keys are available
 openai_client = None
+async_openai_client: "AsyncOpenAI | None" = None
 gmaps: googlemaps.Client | None = None
 
+# Guards lazy client construction so concurrent callers share a single instance
+_client_lock = threading.Lock()
 
-def initialize_clients() -> None:
-    """Initialize API clients if API keys are available."""
+# Connection pool size for the Google Maps HTTP session
+GMAPS_POOL_SIZE = 16
 
-    global openai_client, gmaps
+# Number of per-key clients kept alive for user-supplied API keys (web app and backend)
+KEYED_CLIENT_CACHE_SIZE = 64
 
-    if OPENAI_API_KEY:
-        openai_client = OpenAI(api_key=OPENAI_API_KEY)
-    else:
+# Maximum number of geocoding requests issued concurrently
+GEOCODE_MAX_WORKERS = 10
+
+# Douglas-Peucker tolerance in degrees (~11 m) applied to the route line in GeoJSON
+ROUTE_SIMPLIFY_TOLERANCE = 1e-4
+
+# Decimal places kept for GeoJSON coordinates (5 places is ~1 m)
+COORDINATE_PRECISION = 5
+
+# Geocoding results are stable, so keep them on disk for 30 days
+GEOCODE_CACHE_TTL = 30 * 24 * 3600
+geocode_cache = DiskCache("geocode", ttl_seconds=GEOCODE_CACHE_TTL)
+
+# Bicycle routes change rarely, so directions are reused for a week
+DIRECTIONS_CACHE_TTL = 7 * 24 * 3600
+directions_cache = DiskCache("directions", ttl_seconds=DIRECTIONS_CACHE_TTL, maxsize=256)
+
+# Completed LLM responses keyed by a hash of the full request
+LLM_CACHE_TTL = 7 * 24 * 3600
+llm_cache = DiskCache("llm", ttl_seconds=LLM_CACHE_TTL)
+
+
+def initialize_clients() -> None:
+    """Initialize API clients if API keys are available.
+
+    Safe to call repeatedly and from multiple threads; existing clients are kept.
+    """
+    if _get_openai_client() is None:
         print("Warning: OPENAI_API_KEY not set; OpenAI features disabled")
 
-    if GOOGLE_MAPS_API_KEY:
-        gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
-    else:
+    if _get_gmaps() is None:
         print("Warning: GOOGLE_MAPS_API_KEY not set; Google Maps features disabled")
 
 
+def _get_openai_client() -> Optional["OpenAI"]:
+    """Return the shared OpenAI client, creating it on first use."""
+    global openai_client
+    if openai_client is None and OPENAI_API_KEY:
+        with _client_lock:
+            if openai_client is None:
+                from openai import OpenAI
+
+                openai_client = OpenAI(api_key=OPENAI_API_KEY)
+    return openai_client
+
+
+def _get_async_openai_client() -> Optional["AsyncOpenAI"]:
+    """Return the shared AsyncOpenAI client, creating it on first use."""
+    global async_openai_client
+    if async_openai_client is None and OPENAI_API_KEY:
+        with _client_lock:
+            if async_openai_client is None:
+                from openai import AsyncOpenAI
+
+                async_openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+    return async_openai_client
+
+
+def _get_gmaps() -> Optional[googlemaps.Client]:
+    """Return the shared Google Maps client, creating it on first use."""
+    global gmaps
+    if gmaps is None and GOOGLE_MAPS_API_KEY:
+        with _client_lock:
+            if gmaps is None:
+                gmaps = create_gmaps_client(GOOGLE_MAPS_API_KEY)
+    return gmaps
+
+
+def create_gmaps_client(api_key: str) -> googlemaps.Client:
+    """
+    Create a Google Maps client backed by a keep-alive connection pool.
+
+    Args:
+        api_key: Google Maps API key
+
+    Returns:
+        Google Maps client that reuses HTTPS connections across calls
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=GMAPS_POOL_SIZE, pool_maxsize=GMAPS_POOL_SIZE)
+    session.mount("https://", adapter)
+    return googlemaps.Client(key=api_key, timeout=30, requests_session=session)
+
+
+@functools.lru_cache(maxsize=KEYED_CLIENT_CACHE_SIZE)
+def openai_client_for_key(api_key: str) -> "OpenAI":
+    """Return an OpenAI client for a user-provided key, shared across calls."""
+    from openai import OpenAI
+
+    return OpenAI(api_key=api_key)
+
+
+@functools.lru_cache(maxsize=KEYED_CLIENT_CACHE_SIZE)
+def gmaps_client_for_key(api_key: str) -> googlemaps.Client:
+    """Return a Google Maps client for a user-provided key, shared across calls."""
+    return create_gmaps_client(api_key)
+
+
+def _normalize_address(address: str) -> str:
+    """Normalize an address for use as a cache key."""
+    return " ".join(address.lower().split())
+
+
+_LOCATION_SEPARATORS = re.compile(r"[\s,]+")
+
+
+def _compact_location(location: str) -> str:
+    """Lowercase a location and strip commas and whitespace for loose comparison."""
+    return _LOCATION_SEPARATORS.sub("", location).lower()
+
+
+def _is_closed_loop(start: str, end: str) -> bool:
+    """Check whether start and end are essentially the same place."""
+    a, b = _compact_location(start), _compact_location(end)
+    return a == b or a in b or b in a
+
+
+def _copy_json(value: Any) -> Any:
+    """Deep-copy JSON-shaped data, via an orjson round-trip when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.loads(orjson.dumps(value))
+        except TypeError:
+            pass
+    return copy.deepcopy(value)
+
+
 def get_bicycle_directions(
-    start: str, end: str, waypoints: Optional[List[str]] = None
+    start: str,
+    end: str,
+    waypoints: Optional[List[str]] = None,
+    optimize_waypoints: bool = True,
+    gmaps_client: Optional[googlemaps.Client] = None,
 ) -> Dict[str, Any]:
     """
     Get bicycle directions from Google Maps API.
@@ -70,40 +468,80 @@ def get_bicycle_directions(
         start: Starting location
         end: Ending location
         waypoints: Optional list of waypoint locations
+        optimize_waypoints: Let Google reorder the waypoints into the shortest route
+        gmaps_client: Google Maps client to use instead of the shared one
 
     Returns:
         Dictionary containing route information
     """
-    global gmaps
-    if gmaps is None:
-        if GOOGLE_MAPS_API_KEY:
-            gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
-        else:
-            print("Warning: GOOGLE_MAPS_API_KEY not set; returning empty directions")
-            return {}
+    client = gmaps_client if gmaps_client is not None else _get_gmaps()
+    if client is None:
+        print("Warning: GOOGLE_MAPS_API_KEY not set; returning empty directions")
+        return {}
+
+    # Waypoint order is part of the key because Google's waypoint_order indexes into it
+    cache_key = json.dumps(
+        [
+            _normalize_address(start),
+            _normalize_address(end),
+            [_normalize_address(waypoint) for waypoint in waypoints or []],
+            optimize_waypoints,
+        ]
+    )
+    cached = directions_cache.get(cache_key)
+    if cached is not None:
+        # Callers annotate the result, so never hand out the cached object itself
+        return _copy_json(cached)
 
     try:
         # Handle None waypoints for the API call
         waypoints_param = waypoints if waypoints else None
 
-        directions_result = gmaps.directions(  # type: ignore
+        directions_result = client.directions(  # type: ignore
             origin=start,
             destination=end,
             mode="bicycling",
             waypoints=waypoints_param,
-            optimize_waypoints=True,
+            optimize_waypoints=optimize_waypoints,
             units="metric",
         )
 
         if not directions_result:
             raise ValueError("No route found between the specified locations")
 
-        return directions_result[0]  # Return the first (best) route
+        route = directions_result[0]  # Use the first (best) route
+        directions_cache.set(cache_key, route)
+        return _copy_json(route)
     except Exception as e:
         print(f"Error getting directions: {e}")
         return {}
 
 
+@functools.lru_cache(maxsize=4096)
+def _decode_polyline(encoded: str) -> Tuple[Tuple[float, float], ...]:
+    """
+    Decode one encoded polyline into (longitude, latitude) tuples.
+
+    Cached because the same directions (and so the same step polylines) are decoded
+    again whenever a trip's map is rebuilt.
+    """
+    if np is None or not encoded:
+        return tuple(polyline.decode(encoded, geojson=True))
+
+    # Each value is a run of 5-bit chunks (ASCII - 63), least significant first, where
+    # every chunk but the last has the 0x20 continuation bit set
+    chunks = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    value_ends = np.flatnonzero((chunks & 0x20) == 0)
+    value_starts = np.concatenate(([0], value_ends[:-1] + 1))
+    shifts = 5 * (np.arange(len(chunks)) - np.repeat(value_starts, value_ends - value_starts + 1))
+    values = np.add.reduceat((chunks & 0x1F) << shifts, value_starts)
+
+    # Zigzag-decode the deltas, then sum them into absolute lat/lng pairs
+    deltas = (values >> 1) ^ -(values & 1)
+    coords = np.cumsum(deltas.reshape(-1, 2), axis=0) / 1e5
+    return tuple(map(tuple, coords[:, ::-1].tolist()))
+
+
 def extract_route_points(directions: Dict[str, Any]) -> List[Tuple[float, float]]:
     """
     Extract coordinate points from Google Maps directions for GeoJSON.
@@ -121,22 +559,19 @@ def extract_route_points(directions: Dict[str, Any]) -> List[Tuple[float, float]
 
     for leg in directions["legs"]:
         for step in leg["steps"]:
-            # Add start point
-            start_lat = step["start_location"]["lat"]
-            start_lng = step["start_location"]["lng"]
-            points.append((start_lng, start_lat))
-
-            # Try to add polyline points if available
-            try:
-                if "polyline" in step and "points" in step["polyline"]:
-                    polyline_points = polyline.decode(step["polyline"]["points"])
-                    for point in polyline_points:
-                        points.append(
-                            (point[1], point[0])
-                        )  # polyline returns [lat, lng], we want [lng, lat]
-            except Exception as e:
-                print(f"Warning: Could not decode polyline for step: {e}")
-                # Continue without detailed polyline points
+            # The step polyline already begins at the step's start_location, so only
+            # fall back to the explicit start point when there is nothing to decode
+            encoded = step.get("polyline", {}).get("points")
+            if encoded:
+                try:
+                    points.extend(_decode_polyline(encoded))
+                    continue
+                except Exception as e:
+                    print(f"Warning: Could not decode polyline for step: {e}")
+                    # Continue without detailed polyline points
+
+            start_location = step["start_location"]
+            points.append((start_location["lng"], start_location["lat"]))
 
     # Add final destination
     if directions["legs"]:
@@ -148,6 +583,79 @@ def extract_route_points(directions: Dict[str, Any]) -> List[Tuple[float, float]
     return points
 
 
+def simplify_route(
+    points: List[Tuple[float, float]], tolerance: float
+) -> List[Tuple[float, float]]:
+    """
+    Simplify a route line with the Ramer-Douglas-Peucker algorithm.
+
+    Args:
+        points: List of (longitude, latitude) tuples
+        tolerance: Maximum allowed deviation in degrees; 0 or less keeps every point
+
+    Returns:
+        Simplified list of (longitude, latitude) tuples that keeps both endpoints
+    """
+    if tolerance <= 0 or len(points) < 3:
+        return list(points)
+
+    tolerance_sq = tolerance * tolerance
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+
+    # Iterative rather than recursive so very long routes cannot hit the recursion limit
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = points[first]
+        dx = points[last][0] - x1
+        dy = points[last][1] - y1
+        segment_sq = dx * dx + dy * dy
+
+        max_dist_sq = 0.0
+        index = first
+        for i in range(first + 1, last):
+            px = points[i][0] - x1
+            py = points[i][1] - y1
+            if segment_sq:
+                # Distance to the closest point on the segment (handles loops back to start)
+                t = max(0.0, min(1.0, (px * dx + py * dy) / segment_sq))
+                px -= t * dx
+                py -= t * dy
+            dist_sq = px * px + py * py
+            if dist_sq > max_dist_sq:
+                max_dist_sq = dist_sq
+                index = i
+
+        if max_dist_sq > tolerance_sq:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def route_totals(directions: Dict[str, Any]) -> Tuple[float, float]:
+    """
+    Sum distance and duration over all legs of a route in a single pass.
+
+    Args:
+        directions: Google Maps directions result
+
+    Returns:
+        Tuple of (total distance in km, total duration in hours)
+
+    Raises:
+        KeyError: If directions has no legs
+    """
+    distance_m = 0
+    duration_s = 0
+    for leg in directions["legs"]:
+        distance_m += leg["distance"]["value"]
+        duration_s += leg["duration"]["value"]
+    return distance_m / 1000, duration_s / 3600
+
+
 def create_default_profile() -> Dict[str, Any]:
     """
     Create a default profile configuration.
@@ -226,6 +734,12 @@ def load_profile(profile_path: str) -> Dict[str, Any]:
         raise ValueError(f"Error loading profile file {profile_path}: {e}")
 
 
+def _write_yaml(path: Path, data: Dict[str, Any]) -> None:
+    """Write data as block-style YAML, using the libyaml dumper when available."""
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.dump(data, f, Dumper=_YAML_DUMPER, default_flow_style=False)
+
+
 def save_profile(profile_data: Dict[str, Any], profile_path: str) -> None:
     """
     Save user preferences to a YAML profile file.
@@ -399,17 +913,28 @@ def ask_follow_up_questions() -> Dict[str, str]:
     return preferences
 
 
-def plan_tour_itinerary(
+def _preferences_block(preferences: Dict[str, Any]) -> str:
+    """Format the user preferences listed in the itinerary prompts."""
+    return f"""- Accommodation: {preferences.get('accommodation', 'mixed')}
+- Stealth camping allowed: {preferences.get('stealth_camping', False)}
+- Fitness level: {preferences.get('fitness_level', 'intermediate')}
+- Terrain preference: {preferences.get('terrain', 'mixed')}
+- Tire size: {preferences.get('tire_size', '700x35c (Gravel - Standard)')}
+- Budget: {preferences.get('budget', 'moderate')}
+- Interests: {', '.join(preferences.get('interests', []))}"""
+
+
+def _itinerary_request(
     start: str,
     end: str,
     nights: int,
     preferences: Dict[str, str],
     desires: Optional[List[str]] = None,
     departure_date: Optional[str] = None,
+    gmaps_client: Optional[googlemaps.Client] = None,
 ) -> Dict[str, Any]:
     """
-    First step: Plan the tour itinerary with specific waypoints and overnight stops.
-    This determines WHERE to go before figuring out HOW to get there.
+    Build the chat completion request used to plan the tour itinerary.
 
     Args:
         start: Starting location
@@ -417,31 +942,18 @@ def plan_tour_itinerary(
         nights: Number of nights
         preferences: User preferences from follow-up questions
         departure_date: Optional departure date (format: YYYY-MM-DD)
+        gmaps_client: Google Maps client to use instead of the shared one
 
     Returns:
-        Dictionary containing planned itinerary with waypoints and overnight stops
+        Keyword arguments for chat.completions.create()
     """
-    global openai_client
-    if openai_client is None and OPENAI_API_KEY:
-        openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
     # Get daily distance preference
     daily_distance = preferences.get("daily_distance", "60-80")
     if "km" in daily_distance:
         daily_distance = daily_distance.replace("km", "").strip()
 
     # Detect if this is a closed-loop tour (start and end are the same or very similar)
-    is_closed_loop = (
-        start.lower().strip() == end.lower().strip()
-        or
-        # Also check if they're essentially the same location with slight variations
-        (
-            start.replace(",", "").replace(" ", "").lower()
-            in end.replace(",", "").replace(" ", "").lower()
-            or end.replace(",", "").replace(" ", "").lower()
-            in start.replace(",", "").replace(" ", "").lower()
-        )
-    )
+    is_closed_loop = _is_closed_loop(start, end)
 
     # Estimate rough distance for planning
     try:
@@ -457,10 +969,8 @@ def plan_tour_itinerary(
             total_distance = avg_daily_distance * (nights + 1)
         else:
             # Get a quick direct route estimate for planning purposes only
-            rough_directions = get_bicycle_directions(start, end)
-            total_distance = (
-                sum(leg["distance"]["value"] for leg in rough_directions["legs"]) / 1000
-            )
+            rough_directions = get_bicycle_directions(start, end, gmaps_client=gmaps_client)
+            total_distance, _ = route_totals(rough_directions)
     except:
         # Fallback if route query fails
         total_distance = 100  # Default assumption
@@ -482,384 +992,453 @@ def plan_tour_itinerary(
         # But we'll be more conservative and use about 30-40% of total distance as max radius
         max_radius_km = int(avg_daily * (nights + 1) * 0.35)
 
+        instructions = CLOSED_LOOP_ITINERARY_PROMPT
+        checklist = "\n".join(
+            f"- Day {day} destination: Can you get back to {start} in {nights + 1 - day} days at {daily_distance} km/day?"
+            for day in range(1, nights + 1)
+        )
         prompt = f"""
-You are an expert bikepacking tour planner with access to current web information. Your job is to plan a CLOSED-LOOP TOUR itinerary - a route that starts and ends at the same location.
+TRIP PARAMETERS:
+- Start/End: {start}
+- Duration: {nights} nights ({nights + 1} days)
+- Daily distance preference: {daily_distance} km per day
+- Estimated total loop distance: {total_distance:.0f} km
+- Maximum radius from start: about {max_radius_km}km radius (straight-line distance)
+- Departure date: {departure_date if departure_date else "Not specified"}
 
-IMPORTANT: Use web search to find current, up-to-date information about:
-- Campgrounds and accommodations (availability, booking info, current status)
-- Bike trails and cycling routes (conditions, closures, recent reviews)
-- Local bike shops and services along the route
-- Current weather patterns and seasonal considerations
-- Local events or festivals that might affect the trip
-- Recent cyclist reviews and recommendations for the area
+USER PREFERENCES:
+{_preferences_block(preferences)}
 
+TASK: Plan a {nights + 1}-day CLOSED-LOOP itinerary that starts and ends at {start} within a max radius of {max_radius_km}km, returning "day_1" to "day_{nights + 1}".
+
+VALIDATION CHECKLIST FOR EACH DAY:
+{checklist}
+- Final day: MUST be exactly within {daily_distance} km of {start}
+"""
+    else:
+        instructions = POINT_TO_POINT_ITINERARY_PROMPT
+        prompt = f"""
 TRIP PARAMETERS:
-- Start/End: {start}
+- Start: {start}
+- End: {end}
 - Duration: {nights} nights ({nights + 1} days)
+- Rough total distance: {total_distance:.0f} km
 - Daily distance preference: {daily_distance} km per day
-- Estimated total loop distance: {total_distance:.0f} km
 - Departure date: {departure_date if departure_date else "Not specified"}
 
 USER PREFERENCES:
-- Accommodation: {preferences.get('accommodation', 'mixed')}
-- Stealth camping allowed: {preferences.get('stealth_camping', False)}
-- Fitness level: {preferences.get('fitness_level', 'intermediate')}
-- Terrain preference: {preferences.get('terrain', 'mixed')}
-- Tire size: {preferences.get('tire_size', '700x35c (Gravel - Standard)')}
-- Budget: {preferences.get('budget', 'moderate')}
-- Interests: {', '.join(preferences.get('interests', []))}
+{_preferences_block(preferences)}
 
-TASK: Plan a {nights + 1}-day CLOSED-LOOP itinerary that starts and ends at the same location.
+TASK: Plan a {nights + 1}-day itinerary from {start} to {end} with specific waypoints and overnight locations, returning "day_1" to "day_{nights + 1}".
+"""
 
-CRITICAL REQUIREMENTS FOR CLOSED-LOOP TOURS:
-1. **Every single day MUST be within {daily_distance} km** - including the final return day
-2. **Plan a true loop, not out-and-back** - avoid going straight out and straight back
-3. **Maximum radius calculation** - with {nights + 1} days and {daily_distance} km/day, you can only go about {max_radius_km}km from start as the crow flies
-4. **Think circular/polygonal** - plan destinations that form a roughly circular or polygonal pattern around the start point
-5. **Balance the loop** - ensure you're never more than {max_radius_km}km from home at any point
+    return {
+        "model": PLAN_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": ITINERARY_SYSTEM_PROMPT + instructions,
+            },
+            {"role": "user", "content": prompt},
+        ],
+        "max_tokens": min(
+            ITINERARY_MAX_TOKENS,
+            ITINERARY_BASE_TOKENS + ITINERARY_TOKENS_PER_DAY * (nights + 1),
+        ),
+        "temperature": 0.7,
+        "response_format": {"type": "json_object"},
+    }
 
-ROUTE SURFACE AND TIRE COMPATIBILITY:
-Based on tire size "{preferences.get('tire_size', '700x35c (Gravel - Standard)')}" and terrain preference "{preferences.get('terrain', 'mixed')}":
-- If tire size contains "23", "25", or "28mm": Prioritize paved roads, light gravel paths, and well-maintained bike paths
-- If tire size contains "32", "35", "40mm" or "650b": Good for mixed terrain - paved roads, gravel paths, and light trails
-- If tire size contains "2.1", "2.25", "2.35", or "2.8": Can handle mountain bike trails, singletrack, and rougher terrain
-- Always match route surface recommendations to tire capabilities for safety and comfort
 
-LOOP PLANNING STRATEGY:
-For a {nights + 1}-day loop with {daily_distance} km daily distance:
-- **Maximum distance from start**: About {max_radius_km}km radius (straight-line distance)
-- **Loop geometry**: Plan waypoints that form a circle/polygon, not a line
-- **Progressive planning**: Each day should move you around the loop, not just away from start
-- **Return consideration**: Every waypoint should be positioned such that you can get home within the remaining days at {daily_distance} km/day
+def _request_key(request: Dict[str, Any]) -> str:
+    """Return a content hash of a chat completion request for cache lookups."""
+    if orjson is not None:
+        payload = orjson.dumps(request, option=orjson.OPT_SORT_KEYS)
+    else:
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
 
-BEFORE PLANNING: Calculate if each overnight location can get you back to {start} within the remaining days.
-Example: If it's day 3 of 6, and you're in location X, can you get from X to {start} in 3 days at {daily_distance} km/day?
 
-VALIDATION CHECKLIST FOR EACH DAY:
-- Day 1 destination: Can you get back to {start} in {nights} days at {daily_distance} km/day?
-- Day 2 destination: Can you get back to {start} in {nights-1} days at {daily_distance} km/day?
-- Day 3 destination: Can you get back to {start} in {nights-2} days at {daily_distance} km/day?
-- Continue this pattern...
-- Final day: MUST be exactly within {daily_distance} km of {start}
+async def _stream_content(client: "AsyncOpenAI", request: Dict[str, Any]) -> str:
+    """
+    Stream a chat completion, reporting progress as tokens arrive.
 
-Think of this as planning waypoints on a circle or polygon around {start}, not a straight line out and back.
+    Args:
+        client: AsyncOpenAI client
+        request: Keyword arguments for chat.completions.create()
 
-Return the plan in this exact JSON format:
+    Returns:
+        The full message content
+    """
+    stream = await client.chat.completions.create(**request, stream=True)
+    parts: List[str] = []
+    received = 0
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            received += len(delta)
+            print(f"\r   ✍️  Received {received} characters...", end="", flush=True)
+    if received:
+        print()
+    return "".join(parts)
+
+
+def _parse_itinerary_content(content: Optional[str]) -> Dict[str, Any]:
+    """
+    Parse the itinerary JSON out of a chat completion's message content.
 
-{{
-    "itinerary": {{
-        "day_1": {{
-            "start_location": "{start}",
-            "end_location": "Town/City within {daily_distance.split('-')[0] if '-' in daily_distance else daily_distance[:2]}km of start",
-            "overnight_location": "Specific accommodation name or camping area",
-            "highlights": ["attraction 1", "attraction 2"],
-            "estimated_distance_km": {daily_distance.split('-')[0] if '-' in daily_distance else daily_distance[:2]},
-            "distance_from_start_km": "Straight-line distance from {start}",
-            "days_remaining_to_return": {nights}
-        }},
-        "day_2": {{
-            "start_location": "Previous end location",
-            "end_location": "Next waypoint continuing around the loop (not further from start)",
-            "overnight_location": "Specific accommodation name or camping area", 
-            "highlights": ["attraction 1", "attraction 2"],
-            "estimated_distance_km": {daily_distance.split('-')[1] if '-' in daily_distance else daily_distance[:2]},
-            "distance_from_start_km": "Straight-line distance from {start}",
-            "days_remaining_to_return": {nights-1}
-        }},
-        ...continue for all {nights + 1} days...
-        "day_{nights + 1}": {{
-            "start_location": "Previous end location",
-            "end_location": "{start}",
-            "overnight_location": "Back home",
-            "highlights": ["final attractions", "return home"],
-            "estimated_distance_km": {daily_distance.split('-')[0] if '-' in daily_distance else daily_distance[:2]},
-            "distance_from_start_km": 0,
-            "days_remaining_to_return": 0
-        }}
-    }},
-    "total_estimated_distance": {total_distance:.0f},
-    "route_summary": "Closed-loop tour starting and ending at {start}, max radius {max_radius_km}km",
-    "validation_note": "Each overnight location verified to be returnable within remaining days at {daily_distance} km/day"
-}}
+    Args:
+        content: Message content returned for an itinerary request
 
-IMPORTANT: Every overnight location MUST be positioned such that:
-(distance_from_start_km * 1.4) <= (days_remaining_to_return * max_daily_distance)
-This ensures you can always get back within your daily distance constraints.
+    Returns:
+        Planned itinerary dictionary
 
-SEARCH REQUIREMENTS:
-- Search for current weather forecasts for all planned locations and travel dates{f" (starting {departure_date})" if departure_date else ""}
-- Find specific, bookable accommodations with current availability and pricing
-- Verify trail conditions and any seasonal closures or restrictions
-- Look up local services and attractions with current operating information
-- Check for seasonal events, festivals, or special conditions during the planned travel period
-"""
-    else:
-        prompt = f"""
-You are an expert bikepacking tour planner. Your job is to plan the ITINERARY first - determining the best places to visit and stay overnight.
+    Raises:
+        ValueError: If the response is not a JSON object
+    """
+    if not content:
+        raise ValueError("Empty response from OpenAI")
 
-TRIP PARAMETERS:
-- Start: {start}
-- End: {end}
-- Duration: {nights} nights ({nights + 1} days)
-- Rough total distance: {total_distance:.0f} km
-- Daily distance preference: {daily_distance} km per day
-- Departure date: {departure_date if departure_date else "Not specified"}
+    # The request asks for a JSON object response, so the content is the JSON itself
+    try:
+        itinerary = orjson.loads(content) if orjson is not None else json.loads(content)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON in response: {e}") from e
 
-USER PREFERENCES:
-- Accommodation: {preferences.get('accommodation', 'mixed')}
-- Stealth camping allowed: {preferences.get('stealth_camping', False)}
-- Fitness level: {preferences.get('fitness_level', 'intermediate')}
-- Terrain preference: {preferences.get('terrain', 'mixed')}
-- Tire size: {preferences.get('tire_size', '700x35c (Gravel - Standard)')}
-- Budget: {preferences.get('budget', 'moderate')}
-- Interests: {', '.join(preferences.get('interests', []))}
+    if not isinstance(itinerary, dict):
+        raise ValueError("No JSON object found in response")
+    return itinerary
 
-TASK: Plan a {nights + 1}-day itinerary with specific waypoints and overnight locations.
 
-SEARCH REQUIREMENTS:
-- Search for current weather forecasts for all planned locations and travel dates{f" (starting {departure_date})" if departure_date else ""}
-- Find specific, bookable accommodations with current availability and pricing
-- Verify trail conditions and any seasonal closures or restrictions
-- Look up local services and attractions with current operating information
-- Check for seasonal events, festivals, or special conditions during the planned travel period
+def _fallback_itinerary(start: str, end: str, nights: int) -> Dict[str, Any]:
+    """Return a simple 2-stop itinerary used when planning fails."""
+    return {
+        "itinerary": {
+            "day_1": {
+                "start_location": start,
+                "end_location": f"Midpoint between {start} and {end}",
+                "overnight_location": "Local camping area",
+                "highlights": ["Scenic route", "Local attractions"],
+                "estimated_distance_km": 80,
+            },
+            f"day_{nights + 1}": {
+                "start_location": f"Midpoint between {start} and {end}",
+                "end_location": end,
+                "overnight_location": "Arrive at destination",
+                "highlights": ["Final stretch", "Destination arrival"],
+                "estimated_distance_km": 80,
+            },
+        },
+        "total_estimated_distance": 160,
+        "route_summary": f"Simple route from {start} to {end}",
+    }
 
-PLANNING REQUIREMENTS:
-1. Identify the best intermediate destinations that make sense for a bikepacking tour
-2. Consider scenic routes, points of interest, accommodation availability
-3. Plan realistic daily segments based on terrain and fitness level - stay within {daily_distance} km per day
-4. Choose specific towns/cities/landmarks as overnight stops
-5. Ensure progression toward the final destination
 
-ROUTE SURFACE AND TIRE COMPATIBILITY:
-Based on tire size "{preferences.get('tire_size', '700x35c (Gravel - Standard)')}" and terrain preference "{preferences.get('terrain', 'mixed')}":
-- If tire size contains "23", "25", or "28mm": Prioritize paved roads, light gravel paths, and well-maintained bike paths
-- If tire size contains "32", "35", "40mm" or "650b": Good for mixed terrain - paved roads, gravel paths, and light trails  
-- If tire size contains "2.1", "2.25", "2.35", or "2.8": Can handle mountain bike trails, singletrack, and rougher terrain
-- Always match route surface recommendations to tire capabilities for safety and comfort
+def _return_feasible(distance_from_start_km: float, days_remaining: int, max_daily_km: float) -> bool:
+    """Check whether a stop this far from the start can be ridden home in the remaining days."""
+    return distance_from_start_km * RETURN_DETOUR_FACTOR <= days_remaining * max_daily_km
 
-Return the plan in this exact JSON format with EXTENSIVE DETAIL:
 
-{{
-    "itinerary": {{
-        "day_1": {{
-            "start_location": "{start}",
-            "end_location": "Specific Town/City Name",
-            "waypoints": [
-                "Waypoint 1 name (15km) - Description and services",
-                "Waypoint 2 name (35km) - Description and services", 
-                "Waypoint 3 name (55km) - Description and services"
-            ],
-            "overnight_location": "Specific accommodation name with contact info",
-            "highlights": ["attraction 1 with details", "attraction 2 with details", "attraction 3 with details"],
-            "estimated_distance_km": 75,
-            "elevation_gain_m": 850,
-            "difficulty": "moderate",
-            "surface_types": "40km paved road, 25km gravel path, 10km dirt trail",
-            "food_stops": ["Restaurant Name at km 20", "Grocery Store at km 45"],
-            "water_sources": ["Public fountain at km 10", "Stream at km 30", "Town well at km 60"]
-        }},
-        "day_2": {{
-            "start_location": "Previous end location",
-            "end_location": "Next Town/City Name",
-            "waypoints": [
-                "Day 2 waypoint 1 (20km) - Description and services",
-                "Day 2 waypoint 2 (45km) - Description and services"
-            ],
-            "overnight_location": "Specific accommodation name with contact info",
-            "highlights": ["day 2 attraction 1 with details", "day 2 attraction 2 with details"],
-            "estimated_distance_km": 80,
-            "elevation_gain_m": 650,
-            "difficulty": "easy",
-            "surface_types": "50km paved road, 30km gravel path",
-            "food_stops": ["Food options for day 2"],
-            "water_sources": ["Water sources for day 2"]
-        }},
-        ...continue for all {nights + 1} days with the same level of detail...
-        "day_{nights + 1}": {{
-            "start_location": "Previous end location",
-            "end_location": "{end}",
-            "waypoints": ["Final day waypoints with descriptions"],
-            "overnight_location": "Arrive at destination",
-            "highlights": ["final day attractions with details"],
-            "estimated_distance_km": 65,
-            "elevation_gain_m": 400,
-            "difficulty": "moderate",
-            "surface_types": "final day surface breakdown",
-            "food_stops": ["final day food options"],
-            "water_sources": ["final day water sources"]
-        }}
-    }},
-    "total_estimated_distance": 400,
-    "total_elevation_gain": 2000,
-    "route_summary": "Comprehensive description of the overall route including terrain, highlights, and challenges",
-    "best_months": ["April", "May", "September", "October"],
-    "gear_recommendations": ["specific gear for this route"],
-    "emergency_contacts": ["relevant emergency contacts for the route area"],
-    "permits_required": ["any permits or fees needed"],
-    "difficulty_rating": "beginner/intermediate/advanced"
-}}
+def _warn_unreturnable_days(itinerary: Dict[str, Any], preferences: Dict[str, Any]) -> List[str]:
+    """
+    Warn about closed-loop days whose overnight stop is too far out to get home in time.
 
-Be specific with location names (include city, state/province). Choose real places that make sense for bikepacking.
+    The model is asked to keep every stop returnable; this checks the distances it
+    reports against the upper end of the daily distance preference.
 
-IMPORTANT: Use web search to find:
-1. Current weather forecasts for each location and planned travel dates
-2. Specific accommodations with real names, contact info, current availability and pricing
-3. Verify all locations and services are real and currently operating
-"""
+    Returns:
+        Keys of the days that fail the check
+    """
+    daily_distance = str(preferences.get("daily_distance", "60-80")).replace("km", "").strip()
+    try:
+        max_daily_km = float(daily_distance.split("-")[-1])
+    except ValueError:
+        return []
+
+    unreturnable = []
+    daily_plans = itinerary.get("itinerary", {})
+    for day_key in _sorted_day_keys(daily_plans):
+        day_plan = daily_plans[day_key]
+        try:
+            distance = float(day_plan["distance_from_start_km"])
+            days_remaining = int(day_plan["days_remaining_to_return"])
+        except (KeyError, TypeError, ValueError):
+            # Missing or descriptive values can't be checked
+            continue
+        if not _return_feasible(distance, days_remaining, max_daily_km):
+            unreturnable.append(day_key)
+
+    if unreturnable:
+        print(f"Warning: Overnight stops may be too far to return from in time: {', '.join(unreturnable)}")
+    return unreturnable
+
+
+def _preferences_key(preferences: Dict[str, Any]) -> List[str]:
+    """
+    Return the preference values the itinerary prompt actually uses.
+
+    Preference dicts often carry keys the prompt never reads (e.g. trip_style), so
+    keying on the rendered values lets such variants share one cached itinerary.
+    """
+    return [preferences.get("daily_distance", "60-80"), _preferences_block(preferences)]
+
+
+def _itinerary_key(
+    start: str,
+    end: str,
+    nights: int,
+    preferences: Dict[str, Any],
+    desires: Optional[List[str]] = None,
+    departure_date: Optional[str] = None,
+) -> str:
+    """
+    Return the cache key for an itinerary, built from the planning inputs.
+
+    Keying on the inputs rather than the finished request lets a repeat plan skip
+    building the prompt, including its rough-distance directions lookup. Locations are
+    normalized so differences in case and spacing still hit, and the fixed
+    instructions are part of the key so editing them invalidates old itineraries.
+
+    The key deliberately has no API-key or user component: the itinerary depends only
+    on these inputs, so plan_tour_itinerary_with_keys shares entries across users, and
+    a hit requires an identical trip request. Add a tenant component here if cached
+    itineraries must ever be isolated per key. Hits are copied out of llm_cache, so
+    callers may mutate what they get back.
+    """
+    return _request_key(
+        {
+            "model": PLAN_MODEL,
+            "instructions": [ITINERARY_SYSTEM_PROMPT, CLOSED_LOOP_ITINERARY_PROMPT, POINT_TO_POINT_ITINERARY_PROMPT],
+            "start": _normalize_address(start),
+            "end": _normalize_address(end),
+            "nights": nights,
+            "preferences": _preferences_key(preferences),
+            "desires": desires or [],
+            "departure_date": departure_date,
+        }
+    )
+
+
+def plan_tour_itinerary(
+    start: str,
+    end: str,
+    nights: int,
+    preferences: Dict[str, str],
+    desires: Optional[List[str]] = None,
+    departure_date: Optional[str] = None,
+    client: Optional["OpenAI"] = None,
+    gmaps_client: Optional[googlemaps.Client] = None,
+) -> Dict[str, Any]:
+    """
+    First step: Plan the tour itinerary with specific waypoints and overnight stops.
+    This determines WHERE to go before figuring out HOW to get there.
+
+    Args:
+        start: Starting location
+        end: Ending location
+        nights: Number of nights
+        preferences: User preferences from follow-up questions
+        departure_date: Optional departure date (format: YYYY-MM-DD)
+        client: OpenAI client to use instead of the shared one
+        gmaps_client: Google Maps client to use instead of the shared one
+
+    Returns:
+        Dictionary containing planned itinerary with waypoints and overnight stops
+    """
+    cache_key = _itinerary_key(start, end, nights, preferences, desires, departure_date)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        # Callers reorder itineraries in place, so never hand out the cached object
+        return _copy_json(cached)
+
+    if client is None:
+        client = _get_openai_client()
+    request = _itinerary_request(
+        start, end, nights, preferences, desires, departure_date, gmaps_client
+    )
 
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert bikepacking tour planner with access to current web information. CRITICAL: You must respond with ONLY valid JSON exactly as requested - no additional text, no markdown, no explanations outside the JSON. Be extremely detailed within the JSON structure. IMPORTANT: Use your web search capabilities to find current information about: 1) Specific accommodations (campgrounds, hotels, hostels) with availability, pricing, and booking details, 2) Current weather forecasts for the planned travel dates and locations, 3) Trail conditions and any closures, 4) Local attractions and their current operating status. Search for real, specific places and current information. Include MANY waypoints and detailed descriptions for each day. When planning closed-loop tours, ensure the route forms a loop back to the start.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            max_tokens=4000,
-            temperature=0.7,
-        )
+        response = client.chat.completions.create(**request)  # type: ignore
+        itinerary = _parse_itinerary_content(response.choices[0].message.content)
+        if _is_closed_loop(start, end):
+            _warn_unreturnable_days(itinerary, preferences)
+        llm_cache.set(cache_key, _copy_json(itinerary))
+        return itinerary
 
-        import json
+    except Exception as e:
+        print(f"Error planning itinerary: {e}")
+        # Fallback to simple 2-stop itinerary
+        return _fallback_itinerary(start, end, nights)
 
-        if hasattr(response, "choices"):
-            content = response.choices[0].message.content
-        else:
-            content = response["choices"][0]["message"]["content"]
-        if not content:
-            raise ValueError("Empty response from OpenAI")
-
-        itinerary_json = content.strip()
-
-        # More robust JSON extraction
-        # Look for JSON content between markers or extract the first complete JSON object
-        if itinerary_json.startswith("```json"):
-            itinerary_json = itinerary_json[7:]
-        if itinerary_json.endswith("```"):
-            itinerary_json = itinerary_json[:-3]
-
-        # Find the start and end of the JSON object
-        json_start = itinerary_json.find("{")
-        if json_start == -1:
-            raise ValueError("No JSON object found in response")
-
-        # Find the matching closing brace by counting braces
-        brace_count = 0
-        json_end = -1
-        for i, char in enumerate(itinerary_json[json_start:], json_start):
-            if char == "{":
-                brace_count += 1
-            elif char == "}":
-                brace_count -= 1
-                if brace_count == 0:
-                    json_end = i + 1
-                    break
-
-        if json_end == -1:
-            # Fallback: try to parse the whole cleaned content
-            json_content = itinerary_json.strip()
-        else:
-            json_content = itinerary_json[json_start:json_end]
 
-        itinerary = json.loads(json_content)
+async def plan_tour_itinerary_async(
+    start: str,
+    end: str,
+    nights: int,
+    preferences: Dict[str, str],
+    desires: Optional[List[str]] = None,
+    departure_date: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Async variant of plan_tour_itinerary() using the AsyncOpenAI client.
+
+    Args:
+        start: Starting location
+        end: Ending location
+        nights: Number of nights
+        preferences: User preferences from follow-up questions
+        departure_date: Optional departure date (format: YYYY-MM-DD)
+
+    Returns:
+        Dictionary containing planned itinerary with waypoints and overnight stops
+    """
+    cache_key = _itinerary_key(start, end, nights, preferences, desires, departure_date)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        # Callers reorder itineraries in place, so never hand out the cached object
+        return _copy_json(cached)
+
+    client = _get_async_openai_client()
+    # Building the request may query Google Maps for a rough distance estimate
+    request = await asyncio.to_thread(
+        _itinerary_request, start, end, nights, preferences, desires, departure_date
+    )
+
+    try:
+        content = await _stream_content(client, request)  # type: ignore
+        itinerary = _parse_itinerary_content(content)
+        if _is_closed_loop(start, end):
+            _warn_unreturnable_days(itinerary, preferences)
+        llm_cache.set(cache_key, _copy_json(itinerary))
         return itinerary
 
     except Exception as e:
         print(f"Error planning itinerary: {e}")
         # Fallback to simple 2-stop itinerary
-        return {
-            "itinerary": {
-                "day_1": {
-                    "start_location": start,
-                    "end_location": f"Midpoint between {start} and {end}",
-                    "overnight_location": "Local camping area",
-                    "highlights": ["Scenic route", "Local attractions"],
-                    "estimated_distance_km": 80,
-                },
-                f"day_{nights + 1}": {
-                    "start_location": f"Midpoint between {start} and {end}",
-                    "end_location": end,
-                    "overnight_location": "Arrive at destination",
-                    "highlights": ["Final stretch", "Destination arrival"],
-                    "estimated_distance_km": 80,
-                },
-            },
-            "total_estimated_distance": 160,
-            "route_summary": f"Simple route from {start} to {end}",
-        }
+        return _fallback_itinerary(start, end, nights)
+
+
+def _day_number(day_key: str) -> Tuple[int, Any]:
+    """Sort key for "day_N" keys: by N, with any non-numbered keys after them."""
+    suffix = day_key.rsplit("_", 1)[-1]
+    return (0, int(suffix)) if suffix.isdigit() else (1, day_key)
+
+
+def _sorted_day_keys(daily_plans: Dict[str, Any]) -> List[str]:
+    """Return the itinerary day keys in travel order ("day_1", "day_2", ..., "day_10")."""
+    return sorted(daily_plans, key=_day_number)
+
 
+def _reorder_itinerary(
+    daily_plans: Dict[str, Any], day_keys: List[str], waypoint_order: List[int]
+) -> None:
+    """
+    Reorder the intermediate days of an itinerary to follow an optimized waypoint order.
+
+    Args:
+        daily_plans: Itinerary days keyed by day, modified in place
+        day_keys: Day keys in travel order; every day but the last ends at a waypoint
+        waypoint_order: Google's optimized order as indices into the waypoint list
+    """
+    intermediate_keys = day_keys[:-1]
+    reordered = [dict(daily_plans[intermediate_keys[i]]) for i in waypoint_order]
+    trip_start = daily_plans[day_keys[0]]["start_location"]
+
+    for day_key, day_plan in zip(intermediate_keys, reordered):
+        daily_plans[day_key] = day_plan
 
-def get_multi_waypoint_directions(itinerary: Dict[str, Any]) -> Dict[str, Any]:
+    # Chain each day's start to the previous day's end in the new order
+    previous_end = trip_start
+    for day_key in day_keys:
+        daily_plans[day_key]["start_location"] = previous_end
+        previous_end = daily_plans[day_key]["end_location"]
+
+
+def get_multi_waypoint_directions(
+    itinerary: Dict[str, Any],
+    optimize_waypoints: bool = True,
+    gmaps_client: Optional[googlemaps.Client] = None,
+) -> Dict[str, Any]:
     """
     Get bicycle directions for the planned itinerary with multiple waypoints.
 
+    When Google reorders the waypoints, the itinerary days are reordered in place to
+    match so later prompts and map markers follow the optimized route.
+
     Args:
         itinerary: Planned itinerary from plan_tour_itinerary()
+        optimize_waypoints: Let Google reorder the overnight stops into the shortest route
+        gmaps_client: Google Maps client to use instead of the shared one
 
     Returns:
         Google Maps directions with all waypoints
     """
-    global gmaps
-    if gmaps is None:
-        if GOOGLE_MAPS_API_KEY:
-            gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
-        else:
-            # Fallback: build simple directions without API calls
-            daily_plans = itinerary["itinerary"]
-            legs = []
-            prev = None
-            for day_key in sorted(daily_plans.keys()):
-                day_plan = daily_plans[day_key]
-                if prev is None:
-                    start_loc = day_plan["start_location"]
-                else:
-                    start_loc = prev
-                end_loc = day_plan["end_location"]
-                legs.append(
-                    {
-                        "start_address": start_loc,
-                        "end_address": end_loc,
-                        "distance": {"value": 0, "text": "0 km"},
-                        "duration": {"value": 0, "text": "0 mins"},
-                        "start_location": {"lat": 0, "lng": 0},
-                        "end_location": {"lat": 0, "lng": 0},
-                        "steps": [],
-                    }
-                )
-                prev = end_loc
-
-            return {"legs": legs, "routes": [{"legs": legs}]}
+    if gmaps_client is None:
+        gmaps_client = _get_gmaps()
+
+    if gmaps_client is None:
+        # Fallback: build simple directions without API calls
+        daily_plans = itinerary["itinerary"]
+        legs = []
+        prev = None
+        for day_key in _sorted_day_keys(daily_plans):
+            day_plan = daily_plans[day_key]
+            if prev is None:
+                start_loc = day_plan["start_location"]
+            else:
+                start_loc = prev
+            end_loc = day_plan["end_location"]
+            legs.append(
+                {
+                    "start_address": start_loc,
+                    "end_address": end_loc,
+                    "distance": {"value": 0, "text": "0 km"},
+                    "duration": {"value": 0, "text": "0 mins"},
+                    "start_location": {"lat": 0, "lng": 0},
+                    "end_location": {"lat": 0, "lng": 0},
+                    "steps": [],
+                }
+            )
+            prev = end_loc
+
+        return {"legs": legs, "routes": [{"legs": legs}]}
 
     # Extract waypoints from itinerary
     daily_plans = itinerary["itinerary"]
-    waypoints = []
+    day_keys = _sorted_day_keys(daily_plans)
 
-    # Get all intermediate stops (exclude final destination)
-    for day_key in sorted(daily_plans.keys()):
-        day_plan = daily_plans[day_key]
-        end_location = day_plan["end_location"]
-
-        # Don't add the final destination as a waypoint (it will be the destination)
-        if day_key != max(daily_plans.keys()):
-            waypoints.append(end_location)
+    # Get all intermediate stops (the final destination is the route's destination)
+    waypoints = [daily_plans[day_key]["end_location"] for day_key in day_keys[:-1]]
 
     # First location is start, last location is end
-    first_day = daily_plans[min(daily_plans.keys())]
-    last_day = daily_plans[max(daily_plans.keys())]
+    first_day = daily_plans[day_keys[0]]
+    last_day = daily_plans[day_keys[-1]]
 
     start_location = first_day["start_location"]
     end_location = last_day["end_location"]
 
     try:
-        return get_bicycle_directions(start_location, end_location, waypoints)
+        directions = get_bicycle_directions(
+            start_location, end_location, waypoints, optimize_waypoints, gmaps_client
+        )
     except Exception as e:
         print(f"Error getting multi-waypoint directions: {e}")
         # Fallback to simple start-to-end route
-        return get_bicycle_directions(start_location, end_location)
+        directions = get_bicycle_directions(
+            start_location, end_location, gmaps_client=gmaps_client
+        )
 
+    waypoint_order = directions.get("waypoint_order") if directions else None
+    if waypoint_order and waypoint_order != sorted(waypoint_order):
+        _reorder_itinerary(daily_plans, day_keys, waypoint_order)
 
-def generate_trip_plan(
+    return directions
+
+
+def _trip_plan_request(
     start: str,
     end: str,
     nights: int,
@@ -868,9 +1447,9 @@ def generate_trip_plan(
     directions: Dict[str, Any],
     departure_date: Optional[str] = None,
     desires: Optional[List[str]] = None,
-) -> str:
+) -> Dict[str, Any]:
     """
-    Generate a detailed trip plan using the planned itinerary and route data.
+    Build the chat completion request used to write the detailed trip plan.
 
     Args:
         start: Starting location
@@ -882,21 +1461,8 @@ def generate_trip_plan(
         departure_date: Optional departure date (format: YYYY-MM-DD)
 
     Returns:
-        Detailed trip plan as markdown string
+        Keyword arguments for chat.completions.create()
     """
-
-    global openai_client
-    if openai_client is None and OPENAI_API_KEY:
-        openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
-    # Extract route information
-    total_distance = (
-        sum(leg["distance"]["value"] for leg in directions["legs"]) / 1000
-    )  # Convert to km
-    total_duration = (
-        sum(leg["duration"]["value"] for leg in directions["legs"]) / 3600
-    )  # Convert to hours
-
     # Format route and itinerary information
     route_info = format_route_info(directions)
     itinerary_text = format_itinerary_for_prompt(itinerary)
@@ -963,29 +1529,171 @@ ITINERARY STOPS:
 
 Please create a comprehensive trip plan following the example format above. Include practical details like specific accommodation options, food stops, water sources, and safety considerations. Make it engaging and informative."""
 
+    return {
+        "model": WRITE_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": TRIP_PLAN_SYSTEM_PROMPT,
+            },
+            {"role": "user", "content": prompt},
+        ],
+        "max_tokens": 4000,
+        "temperature": 0.7,
+    }
+
+
+def _plan_text(plan: Optional[str], cache_key: str) -> str:
+    """Return the stripped markdown plan from a chat completion's content, caching it."""
+    if plan:
+        plan = plan.strip()
+        llm_cache.set(cache_key, plan)
+        return plan
+    return "Error: Empty response from OpenAI"
+
+
+def generate_trip_plan(
+    start: str,
+    end: str,
+    nights: int,
+    preferences: Dict[str, str],
+    itinerary: Dict[str, Any],
+    directions: Dict[str, Any],
+    departure_date: Optional[str] = None,
+    desires: Optional[List[str]] = None,
+    client: Optional["OpenAI"] = None,
+) -> str:
+    """
+    Generate a detailed trip plan using the planned itinerary and route data.
+
+    Args:
+        start: Starting location
+        end: Ending location
+        nights: Number of nights
+        preferences: User preferences from follow-up questions
+        itinerary: Planned itinerary with waypoints
+        directions: Google Maps directions data for the planned route
+        departure_date: Optional departure date (format: YYYY-MM-DD)
+        client: OpenAI client to use instead of the shared one
+
+    Returns:
+        Detailed trip plan as markdown string
+    """
+    if client is None:
+        client = _get_openai_client()
+    request = _trip_plan_request(
+        start, end, nights, preferences, itinerary, directions, departure_date, desires
+    )
+    cache_key = _request_key(request)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
         # Make API call to OpenAI
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert bikepacking trip planner with extensive knowledge of cycling routes, accommodations, and outdoor safety.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            max_tokens=4000,
-            temperature=0.7,
-        )
+        response = client.chat.completions.create(**request)  # type: ignore
+        trip_plan = _plan_text(response.choices[0].message.content, cache_key)
+        print(f"\n✅ Generated trip plan with {len(trip_plan)} characters")
+        return trip_plan
 
-        if hasattr(response, "choices"):
-            trip_plan = response.choices[0].message.content
-        else:
-            trip_plan = response["choices"][0]["message"]["content"]
-        if trip_plan:
-            trip_plan = trip_plan.strip()
-        else:
-            trip_plan = "Error: Empty response from OpenAI"
+    except Exception as e:
+        error_msg = f"❌ Error generating trip plan: {e}"
+        print(error_msg)
+        return f"Error generating trip plan: {e}"
+
+
+def stream_trip_plan(
+    start: str,
+    end: str,
+    nights: int,
+    preferences: Dict[str, str],
+    itinerary: Dict[str, Any],
+    directions: Dict[str, Any],
+    departure_date: Optional[str] = None,
+    desires: Optional[List[str]] = None,
+    client: Optional["OpenAI"] = None,
+) -> Iterator[str]:
+    """
+    Streaming variant of generate_trip_plan() that yields the plan as it is written.
+
+    A cached plan is yielded in one piece. The full plan is cached once the stream
+    finishes, so joining the yielded chunks gives the same text generate_trip_plan()
+    would return, apart from surrounding whitespace.
+
+    Yields:
+        Chunks of the markdown trip plan
+    """
+    if client is None:
+        client = _get_openai_client()
+    request = _trip_plan_request(
+        start, end, nights, preferences, itinerary, directions, departure_date, desires
+    )
+    cache_key = _request_key(request)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    parts: List[str] = []
+    try:
+        stream = client.chat.completions.create(**request, stream=True)  # type: ignore
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+
+    except Exception as e:
+        error_msg = f"❌ Error generating trip plan: {e}"
+        print(error_msg)
+        yield f"Error generating trip plan: {e}"
+        return
+
+    trip_plan = _plan_text("".join(parts), cache_key)
+    if not parts:
+        yield trip_plan
+    print(f"\n✅ Generated trip plan with {len(trip_plan)} characters")
+
+
+async def generate_trip_plan_async(
+    start: str,
+    end: str,
+    nights: int,
+    preferences: Dict[str, str],
+    itinerary: Dict[str, Any],
+    directions: Dict[str, Any],
+    departure_date: Optional[str] = None,
+    desires: Optional[List[str]] = None,
+) -> str:
+    """
+    Async variant of generate_trip_plan() using the AsyncOpenAI client.
+
+    Args:
+        start: Starting location
+        end: Ending location
+        nights: Number of nights
+        preferences: User preferences from follow-up questions
+        itinerary: Planned itinerary with waypoints
+        directions: Google Maps directions data for the planned route
+        departure_date: Optional departure date (format: YYYY-MM-DD)
+
+    Returns:
+        Detailed trip plan as markdown string
+    """
+    client = _get_async_openai_client()
+    request = _trip_plan_request(
+        start, end, nights, preferences, itinerary, directions, departure_date, desires
+    )
+    cache_key = _request_key(request)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        content = await _stream_content(client, request)  # type: ignore
+        trip_plan = _plan_text(content, cache_key)
         print(f"\n✅ Generated trip plan with {len(trip_plan)} characters")
         return trip_plan
 
@@ -995,7 +1703,7 @@ Please create a comprehensive trip plan following the example format above. Incl
         return f"Error generating trip plan: {e}"
 
 
-def revise_trip_plan_with_feedback(
+def _revision_request(
     original_plan: str,
     feedback: str,
     start: str,
@@ -1005,14 +1713,10 @@ def revise_trip_plan_with_feedback(
     itinerary: Dict[str, Any],
     directions: Dict[str, Any],
     departure_date: Optional[str] = None,
-) -> str:
+) -> Dict[str, Any]:
     """
-    Revise an existing trip plan based on user feedback.
+    Build the chat completion request used to revise a trip plan.
     """
-    global openai_client
-    if openai_client is None and OPENAI_API_KEY:
-        openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
     # Format the route information
     route_info = format_route_info(directions)
     itinerary_text = format_itinerary_for_prompt(itinerary)
@@ -1049,28 +1753,85 @@ ITINERARY STOPS:
 
 Please revise the trip plan based on the user's feedback while maintaining the same format and structure. Address their specific concerns and incorporate their suggestions where possible."""
 
+    return {
+        "model": WRITE_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": REVISION_SYSTEM_PROMPT,
+            },
+            {"role": "user", "content": prompt},
+        ],
+        "max_tokens": 4000,
+        "temperature": 0.7,
+    }
+
+
+def revise_trip_plan_with_feedback(
+    original_plan: str,
+    feedback: str,
+    start: str,
+    end: str,
+    nights: int,
+    preferences: Dict[str, Any],
+    itinerary: Dict[str, Any],
+    directions: Dict[str, Any],
+    departure_date: Optional[str] = None,
+    client: Optional["OpenAI"] = None,
+) -> str:
+    """
+    Revise an existing trip plan based on user feedback.
+    """
+    if client is None:
+        client = _get_openai_client()
+    request = _revision_request(
+        original_plan, feedback, start, end, nights, preferences, itinerary, directions,
+        departure_date,
+    )
+    cache_key = _request_key(request)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert bikepacking trip planner. Revise the existing plan based on the user's feedback while maintaining high quality and practical advice.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            max_tokens=4000,
-            temperature=0.7,
-        )
+        response = client.chat.completions.create(**request)  # type: ignore
+        revised_plan = _plan_text(response.choices[0].message.content, cache_key)
+        print(f"\n✅ Revised trip plan with {len(revised_plan)} characters")
+        return revised_plan
 
-        if hasattr(response, "choices"):
-            revised_plan = response.choices[0].message.content
-        else:
-            revised_plan = response["choices"][0]["message"]["content"]
-        if revised_plan:
-            revised_plan = revised_plan.strip()
-        else:
-            revised_plan = "Error: Empty response from OpenAI"
+    except Exception as e:
+        error_msg = f"❌ Error revising trip plan: {e}"
+        print(error_msg)
+        return f"Error revising trip plan: {e}"
+
+
+async def revise_trip_plan_with_feedback_async(
+    original_plan: str,
+    feedback: str,
+    start: str,
+    end: str,
+    nights: int,
+    preferences: Dict[str, Any],
+    itinerary: Dict[str, Any],
+    directions: Dict[str, Any],
+    departure_date: Optional[str] = None,
+) -> str:
+    """
+    Async variant of revise_trip_plan_with_feedback() using the AsyncOpenAI client.
+    """
+    client = _get_async_openai_client()
+    request = _revision_request(
+        original_plan, feedback, start, end, nights, preferences, itinerary, directions,
+        departure_date,
+    )
+    cache_key = _request_key(request)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        content = await _stream_content(client, request)  # type: ignore
+        revised_plan = _plan_text(content, cache_key)
         print(f"\n✅ Revised trip plan with {len(revised_plan)} characters")
         return revised_plan
 
@@ -1089,6 +1850,12 @@ def main():
     parser.add_argument("--departure-date", help="Departure date (YYYY-MM-DD)")
     parser.add_argument("--profile", help="Profile file to load preferences from")
     parser.add_argument("--output-dir", default="trips", help="Output directory for trip files")
+    parser.add_argument(
+        "--simplify-tolerance",
+        type=float,
+        default=ROUTE_SIMPLIFY_TOLERANCE,
+        help="Route line simplification tolerance in degrees (0 keeps every point)",
+    )
 
     args = parser.parse_args()
 
@@ -1110,10 +1877,15 @@ def main():
 
     print(f"\n🗺️  Planning trip from {args.start} to {args.end} for {args.nights} nights...")
 
+    asyncio.run(_run_trip_planning(args, preferences))
+
+
+async def _run_trip_planning(args: argparse.Namespace, preferences: Dict[str, Any]) -> None:
+    """Run the CLI planning pipeline, awaiting OpenAI calls on the async client."""
     try:
         # Step 1: Plan the itinerary
         print("\n📍 Planning itinerary...")
-        itinerary = plan_tour_itinerary(
+        itinerary = await plan_tour_itinerary_async(
             start=args.start,
             end=args.end,
             nights=args.nights,
@@ -1124,34 +1896,35 @@ def main():
 
         # Step 2: Get route directions
         print("\n🛣️  Getting route directions...")
-        directions = get_multi_waypoint_directions(itinerary)
+        directions = await asyncio.to_thread(get_multi_waypoint_directions, itinerary)
 
         if not directions or "legs" not in directions:
             print("❌ Could not find a route between the specified locations")
             return
 
-        # Step 3: Generate detailed trip plan
-        print("\n📝 Generating detailed trip plan...")
-        trip_plan = generate_trip_plan(
-            start=args.start,
-            end=args.end,
-            nights=args.nights,
-            preferences=preferences,
-            itinerary=itinerary,
-            directions=directions,
-            departure_date=args.departure_date,
-            desires=[],
-        )
-
-        # Step 4: Create GeoJSON
-        print("\n🗺️  Creating route map...")
-        geojson_data = create_geojson(
-            start=args.start,
-            end=args.end,
-            directions=directions,
-            preferences=preferences,
-            trip_plan=trip_plan,
-            itinerary=itinerary,
+        # Steps 3 and 4 only depend on the itinerary and directions, so the trip plan
+        # is written while the route map is built
+        print("\n📝 Generating detailed trip plan and route map...")
+        trip_plan, geojson_data = await asyncio.gather(
+            generate_trip_plan_async(
+                start=args.start,
+                end=args.end,
+                nights=args.nights,
+                preferences=preferences,
+                itinerary=itinerary,
+                directions=directions,
+                departure_date=args.departure_date,
+                desires=[],
+            ),
+            asyncio.to_thread(
+                create_geojson,
+                start=args.start,
+                end=args.end,
+                directions=directions,
+                preferences=preferences,
+                itinerary=itinerary,
+                simplify_tolerance=args.simplify_tolerance,
+            ),
         )
 
         # Step 5: Save output files
@@ -1162,20 +1935,15 @@ def main():
         # Create output directory
         trip_dir.mkdir(parents=True, exist_ok=True)
 
-        # Save trip plan
+        # Save the trip plan, GeoJSON and profile used concurrently
         plan_file = trip_dir / "report.md"
-        with open(plan_file, "w", encoding="utf-8") as f:
-            f.write(trip_plan)
-
-        # Save GeoJSON
         geojson_file = trip_dir / "route.geojson"
-        with open(geojson_file, "w", encoding="utf-8") as f:
-            json.dump(geojson_data, f, indent=2)
-
-        # Save profile used
         profile_file = trip_dir / "profile.yml"
-        with open(profile_file, "w", encoding="utf-8") as f:
-            yaml.dump(preferences, f, default_flow_style=False)
+        await asyncio.gather(
+            asyncio.to_thread(plan_file.write_text, trip_plan, encoding="utf-8"),
+            asyncio.to_thread(write_geojson, geojson_file, geojson_data),
+            asyncio.to_thread(_write_yaml, profile_file, preferences),
+        )
 
         print(f"\n✅ Trip plan completed!")
         print(f"📁 Files saved to: {trip_dir}")
@@ -1184,7 +1952,7 @@ def main():
         print(f"⚙️  Profile: {profile_file}")
 
         # Calculate and display total distance
-        total_distance = sum(leg["distance"]["value"] for leg in directions["legs"]) / 1000
+        total_distance, _ = route_totals(directions)
         print(f"🚴‍♂️ Total distance: {total_distance:.1f} km")
 
     except Exception as e:
@@ -1192,10 +1960,6 @@ def main():
         raise
 
 
-if __name__ == "__main__":
-    main()
-
-
 def format_route_info(directions: Dict[str, Any]) -> str:
     """
     Format route information from Google Maps directions for AI prompt.
@@ -1247,7 +2011,7 @@ def format_itinerary_for_prompt(itinerary: Dict[str, Any]) -> str:
     itinerary_info = []
     daily_plans = itinerary["itinerary"]
 
-    for day_key in sorted(daily_plans.keys()):
+    for day_key in _sorted_day_keys(daily_plans):
         day_plan = daily_plans[day_key]
         day_num = day_key.replace("day_", "")
 
@@ -1267,13 +2031,83 @@ def format_itinerary_for_prompt(itinerary: Dict[str, Any]) -> str:
     return "\n".join(itinerary_info)
 
 
+def _geocode(geocoder: googlemaps.Client, address: str) -> Optional[List[float]]:
+    """Geocode a single address, returning [lng, lat] or None on failure."""
+    cache_key = _normalize_address(address)
+    coords = geocode_cache.get(cache_key)
+    if coords is not None:
+        return coords
+
+    try:
+        geocode_result = geocoder.geocode(address)  # type: ignore
+        if geocode_result:
+            loc = geocode_result[0]["geometry"]["location"]
+            coords = [loc["lng"], loc["lat"]]
+            geocode_cache.set(cache_key, coords)
+            return coords
+    except Exception as e:
+        print(f"Warning: Could not geocode {address}: {e}")
+    return None
+
+
+def geocode_locations(
+    addresses: List[str], gmaps_client: Optional[googlemaps.Client] = None
+) -> Dict[str, Optional[List[float]]]:
+    """
+    Geocode several addresses concurrently.
+
+    Args:
+        addresses: Addresses to geocode; blanks and duplicates are skipped
+        gmaps_client: Google Maps client to use instead of the shared one
+
+    Returns:
+        Mapping of address to [longitude, latitude], or None if it could not be geocoded
+    """
+    geocoder = gmaps_client if gmaps_client is not None else _get_gmaps()
+    unique_addresses = list(dict.fromkeys(address for address in addresses if address))
+    if geocoder is None or not unique_addresses:
+        return {}
+
+    max_workers = min(GEOCODE_MAX_WORKERS, len(unique_addresses))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda address: _geocode(geocoder, address), unique_addresses)
+        return dict(zip(unique_addresses, results))
+
+
+def _leg_end_coords(end_locations: List[str], directions: Dict[str, Any]) -> Dict[str, List[float]]:
+    """
+    Match each day's end location to the end of the corresponding route leg.
+
+    Args:
+        end_locations: Each day's end location, in travel order
+        directions: Directions for the whole itinerary, one leg per day
+
+    Returns:
+        Mapping of end location to [longitude, latitude]; empty when the legs don't
+        line up with the days
+    """
+    legs = (directions or {}).get("legs", [])
+    if len(legs) != len(end_locations):
+        return {}
+
+    coords = {}
+    for end_location, leg in zip(end_locations, legs):
+        location = leg.get("end_location") or {}
+        # The offline fallback legs carry placeholder (0, 0) locations
+        if end_location and (location.get("lng") or location.get("lat")):
+            coords[end_location] = [location["lng"], location["lat"]]
+    return coords
+
+
 def create_geojson(
     start: str,
     end: str,
     directions: Dict[str, Any],
     preferences: Dict[str, Any],
-    trip_plan: str,
+    trip_plan: str = "",
     itinerary: Optional[Dict[str, Any]] = None,
+    simplify_tolerance: float = ROUTE_SIMPLIFY_TOLERANCE,
+    gmaps_client: Optional[googlemaps.Client] = None,
 ) -> Dict[str, Any]:
     """
     Create GeoJSON data from the trip plan and directions.
@@ -1283,8 +2117,12 @@ def create_geojson(
         end: Ending location
         directions: Google Maps directions result
         preferences: User preferences
-        trip_plan: Generated trip plan text
+        trip_plan: Generated trip plan text (not needed for the geometry, so the map
+            can be built while the plan is still being generated)
         itinerary: Planned itinerary data
+        simplify_tolerance: Douglas-Peucker tolerance in degrees for the route line;
+            0 keeps every decoded point
+        gmaps_client: Google Maps client to use instead of the shared one
 
     Returns:
         GeoJSON FeatureCollection
@@ -1292,7 +2130,10 @@ def create_geojson(
     features = []
 
     # Extract route points from directions
-    route_points = extract_route_points(directions)
+    route_points = [
+        (round(lng, COORDINATE_PRECISION), round(lat, COORDINATE_PRECISION))
+        for lng, lat in simplify_route(extract_route_points(directions), simplify_tolerance)
+    ]
 
     if route_points:
         # Create the main route line
@@ -1313,39 +2154,41 @@ def create_geojson(
     if itinerary and "itinerary" in itinerary:
         daily_plans = itinerary["itinerary"]
 
-        for day_key in sorted(daily_plans.keys()):
-            day_plan = daily_plans[day_key]
-            day_num = day_key.replace("day_", "")
-
-            # Try to get coordinates for the end location
-            end_location = day_plan.get("end_location", "")
-            if end_location:
-                coords = None
-                if gmaps:
-                    try:
-                        geocode_result = gmaps.geocode(end_location)  # type: ignore
-                        if geocode_result:
-                            loc = geocode_result[0]["geometry"]["location"]
-                            coords = [loc["lng"], loc["lat"]]
-                    except Exception as e:
-                        print(f"Warning: Could not geocode {end_location}: {e}")
-                if coords is None:
-                    coords = [0, 0]
-
-                waypoint_feature = {
-                    "type": "Feature",
-                    "properties": {
-                        "name": f"Day {day_num}: {end_location}",
-                        "description": f"Overnight: {day_plan.get('overnight_location', 'Unknown')}",
-                        "marker-color": "#ff6600",
-                        "marker-size": "large",
-                        "marker-symbol": f"{day_num}",
-                        "type": "overnight_accommodation",
-                        "night_number": int(day_num),
-                    },
-                    "geometry": {"type": "Point", "coordinates": coords},
-                }
-                features.append(waypoint_feature)
+        # Pull the fields the markers need out of the day dicts in one pass
+        day_keys = _sorted_day_keys(daily_plans)
+        day_numbers = [day_key.replace("day_", "") for day_key in day_keys]
+        end_locations = [daily_plans[day_key].get("end_location", "") for day_key in day_keys]
+        overnights = [daily_plans[day_key].get("overnight_location", "Unknown") for day_key in day_keys]
+
+        # Each day ends where its leg of the route ends, so take the marker positions
+        # from the legs and geocode only the end locations they don't cover
+        geocoded = _leg_end_coords(end_locations, directions)
+        geocoded.update(
+            geocode_locations([location for location in end_locations if location not in geocoded], gmaps_client)
+        )
+
+        features.extend(
+            {
+                "type": "Feature",
+                "properties": {
+                    "name": f"Day {day_num}: {end_location}",
+                    "description": f"Overnight: {overnight}",
+                    "marker-color": "#ff6600",
+                    "marker-size": "large",
+                    "marker-symbol": day_num,
+                    "type": "overnight_accommodation",
+                    "night_number": int(day_num),
+                },
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [
+                        round(value, COORDINATE_PRECISION) for value in geocoded.get(end_location) or [0, 0]
+                    ],
+                },
+            }
+            for day_num, end_location, overnight in zip(day_numbers, end_locations, overnights)
+            if end_location
+        )
 
     # Create the GeoJSON FeatureCollection
     geojson_data = {
@@ -1373,25 +2216,16 @@ def plan_tour_itinerary_with_keys(
     """
     Plan tour itinerary with user-provided API keys.
     """
-    # Temporarily set up clients with user-provided keys
-    original_openai_client = globals().get("openai_client")
-    original_gmaps = globals().get("gmaps")
-
-    try:
-        if openai_key:
-            global openai_client
-            openai_client = OpenAI(api_key=openai_key)
-
-        if google_maps_key:
-            global gmaps
-            gmaps = googlemaps.Client(key=google_maps_key)
-
-        return plan_tour_itinerary(start, end, nights, preferences, desires, departure_date)
-
-    finally:
-        # Restore original clients
-        globals()["openai_client"] = original_openai_client
-        globals()["gmaps"] = original_gmaps
+    return plan_tour_itinerary(
+        start,
+        end,
+        nights,
+        preferences,
+        desires,
+        departure_date,
+        client=openai_client_for_key(openai_key) if openai_key else None,
+        gmaps_client=gmaps_client_for_key(google_maps_key) if google_maps_key else None,
+    )
 
 
 def get_multi_waypoint_directions_with_keys(
@@ -1400,18 +2234,10 @@ def get_multi_waypoint_directions_with_keys(
     """
     Get multi-waypoint directions with user-provided Google Maps API key.
     """
-    original_gmaps = globals().get("gmaps")
-
-    try:
-        if google_maps_key:
-            global gmaps
-            gmaps = googlemaps.Client(key=google_maps_key)
-
-        return get_multi_waypoint_directions(itinerary)
-
-    finally:
-        # Restore original client
-        globals()["gmaps"] = original_gmaps
+    return get_multi_waypoint_directions(
+        itinerary,
+        gmaps_client=gmaps_client_for_key(google_maps_key) if google_maps_key else None,
+    )
 
 
 def generate_trip_plan_with_keys(
@@ -1428,20 +2254,17 @@ def generate_trip_plan_with_keys(
     """
     Generate trip plan with user-provided OpenAI API key.
     """
-    original_openai_client = globals().get("openai_client")
-
-    try:
-        if openai_key:
-            global openai_client
-            openai_client = OpenAI(api_key=openai_key)
-
-        return generate_trip_plan(
-            start, end, nights, preferences, itinerary, directions, departure_date, desires
-        )
-
-    finally:
-        # Restore original client
-        globals()["openai_client"] = original_openai_client
+    return generate_trip_plan(
+        start,
+        end,
+        nights,
+        preferences,
+        itinerary,
+        directions,
+        departure_date,
+        desires,
+        client=openai_client_for_key(openai_key) if openai_key else None,
+    )
 
 
 def create_geojson_with_keys(
@@ -1456,18 +2279,23 @@ def create_geojson_with_keys(
     """
     Create GeoJSON with user-provided Google Maps API key.
     """
-    original_gmaps = globals().get("gmaps")
-
-    try:
-        if google_maps_key:
-            global gmaps
-            gmaps = googlemaps.Client(key=google_maps_key)
+    return create_geojson(
+        start,
+        end,
+        directions,
+        preferences,
+        trip_plan,
+        itinerary,
+        gmaps_client=gmaps_client_for_key(google_maps_key) if google_maps_key else None,
+    )
 
-        return create_geojson(start, end, directions, preferences, trip_plan, itinerary)
 
-    finally:
-        # Restore original client
-        globals()["gmaps"] = original_gmaps
+# Trip plan lines that mention where the night is spent; group 1 is the text after the
+# first word "at" on the line, or the whole line when there is none
+_OVERNIGHT_LINE_RE = re.compile(
+    r"^(?=[^\r\n]*(?:camp|stay at|accommodation))(?:[^\r\n]*?\bat\b)?[ \t]*([^\r\n]*)",
+    re.IGNORECASE | re.MULTILINE,
+)
 
 
 def extract_overnight_locations(
@@ -1478,21 +2306,53 @@ def extract_overnight_locations(
     if itinerary and isinstance(itinerary, dict):
         days = itinerary.get("itinerary", itinerary)
         if isinstance(days, dict):
-            for key in sorted(days.keys()):
+            for key in _sorted_day_keys(days):
                 loc = days.get(key, {}).get("overnight_location")
                 if loc:
                     locations.append(str(loc))
     if not locations:
-        for line in trip_plan.splitlines():
-            lower = line.lower()
-            if "camp" in lower or "stay at" in lower or "accommodation" in lower:
-                if "at" in line:
-                    locations.append(line.split("at", 1)[1].strip(" -*"))
-                else:
-                    locations.append(line.strip(" -*"))
+        locations.extend(match.group(1).strip(" -*") for match in _OVERNIGHT_LINE_RE.finditer(trip_plan))
     return locations
 
 
+def dump_geojson(geojson_data: Dict[str, Any]) -> bytes:
+    """
+    Serialize GeoJSON compactly, using orjson when it is installed.
+
+    Args:
+        geojson_data: GeoJSON FeatureCollection
+
+    Returns:
+        UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(geojson_data)
+    return json.dumps(geojson_data, separators=(",", ":")).encode("utf-8")
+
+
+def write_geojson(path: Union[str, Path], geojson_data: Dict[str, Any]) -> None:
+    """
+    Write GeoJSON compactly, one feature at a time.
+
+    Features are serialized and written individually so the whole collection is never
+    held in memory as a single encoded buffer.
+
+    Args:
+        path: Destination file path
+        geojson_data: GeoJSON FeatureCollection
+    """
+    header = {key: value for key, value in geojson_data.items() if key != "features"}
+    with open(path, "wb") as f:
+        # Everything but the closing brace of the header object
+        f.write(dump_geojson(header)[:-1])
+        f.write(b',"features":[' if header else b'"features":[')
+        for index, feature in enumerate(geojson_data.get("features", [])):
+            if index:
+                f.write(b",")
+            f.write(dump_geojson(feature))
+        f.write(b"]}")
+
+
 def save_outputs(
     trip_plan: str, geojson_data: Dict[str, Any], start: str, end: str
 ) -> Tuple[str, str]:
@@ -1504,6 +2364,9 @@ def save_outputs(
     geojson_file = f"trip_{safe_start}_to_{safe_end}_{timestamp}.geojson"
     with open(md_file, "w", encoding="utf-8") as f:
         f.write(trip_plan)
-    with open(geojson_file, "w", encoding="utf-8") as f:
-        json.dump(geojson_data, f, indent=2)
+    write_geojson(geojson_file, geojson_data)
     return md_file, geojson_file
+
+
+if __name__ == "__main__":
+    main()
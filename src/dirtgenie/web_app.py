@@ -5,26 +5,30 @@ DirtGenie Web App
 A web interface that wraps around the DirtGenie CLI tool.
 """
 
-import json
+import hashlib
 import os
+import re
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
-import pandas as pd
-import pydeck as pdk
 import streamlit as st
+import streamlit.components.v1 as components
 
 # Import our DirtGenie modules
 try:
     # Try absolute import first (when package is installed)
-    from dirtgenie.planner import (create_default_profile, create_geojson, generate_trip_plan,
-                                   get_multi_waypoint_directions, initialize_clients, plan_tour_itinerary,
-                                   revise_trip_plan_with_feedback)
+    from dirtgenie.planner import (create_default_profile, create_geojson, dump_geojson,
+                                   get_multi_waypoint_directions, gmaps_client_for_key, openai_client_for_key,
+                                   plan_tour_itinerary, revise_trip_plan_with_feedback, route_totals,
+                                   simplify_route, stream_trip_plan)
 except ImportError:
     # Fall back to relative import (when running directly)
-    from .planner import (create_default_profile, create_geojson, generate_trip_plan, get_multi_waypoint_directions,
-                          initialize_clients, plan_tour_itinerary, revise_trip_plan_with_feedback)
+    from .planner import (create_default_profile, create_geojson, dump_geojson,
+                          get_multi_waypoint_directions, gmaps_client_for_key, openai_client_for_key,
+                          plan_tour_itinerary, revise_trip_plan_with_feedback, route_totals, simplify_route,
+                          stream_trip_plan)
 
 
 def load_env_api_keys():
@@ -34,17 +38,8 @@ def load_env_api_keys():
     return openai_key, google_key
 
 
-def set_api_keys(openai_key: str, google_key: str):
-    """Set API keys in environment variables."""
-    os.environ["OPENAI_API_KEY"] = openai_key
-    os.environ["GOOGLE_MAPS_API_KEY"] = google_key
-
-
-def validate_api_keys():
+def validate_api_keys(openai_key: str, google_key: str):
     """Validate that API keys are set and not empty."""
-    openai_key = os.getenv("OPENAI_API_KEY", "")
-    google_key = os.getenv("GOOGLE_MAPS_API_KEY", "")
-
     if not openai_key:
         st.error("❌ OpenAI API Key is required")
         return False
@@ -55,47 +50,82 @@ def validate_api_keys():
     return True
 
 
+# Douglas-Peucker tolerance in degrees (~55 m) for the map's route line; at the map's
+# initial zoom a pixel covers more than that, so the downloaded GeoJSON keeps more detail
+MAP_SIMPLIFY_TOLERANCE = 5e-4
+
+# Preference form options, prefilled from the default profile built once at import
+DEFAULT_PROFILE = create_default_profile()
+ACCOMMODATION_OPTIONS = ["camping", "hotels", "mixed"]
+FITNESS_OPTIONS = ["beginner", "intermediate", "advanced"]
+TERRAIN_OPTIONS = ["paved", "gravel", "mixed", "challenging"]
+BUDGET_OPTIONS = ["budget", "moderate", "luxury"]
+ACCOMMODATION_INDEX = {option: i for i, option in enumerate(ACCOMMODATION_OPTIONS)}
+FITNESS_INDEX = {option: i for i, option in enumerate(FITNESS_OPTIONS)}
+TERRAIN_INDEX = {option: i for i, option in enumerate(TERRAIN_OPTIONS)}
+BUDGET_INDEX = {option: i for i, option in enumerate(BUDGET_OPTIONS)}
+
+# Height in pixels of the embedded route map
+MAP_HEIGHT = 600
+
+# Tire size patterns for the setup hint, checked in this order; any other 700x size
+# counts as gravel
+ROAD_TIRE_RE = re.compile(r"700x(?:23|25|28)", re.I)
+GRAVEL_TIRE_RE = re.compile(r"700x|650b x 47|32|35|40", re.I)
+MOUNTAIN_TIRE_RE = re.compile(r"2\.(?:1|25|35|8)")
+
+# Marker type, name property and default name for each GeoJSON point type
+POINT_TYPES = {
+    "waypoint": ("waypoint", "name", "Waypoint"),
+    "overnight_accommodation": ("accommodation", "location_name", "Accommodation"),
+}
+
+# The only feature properties sent to the browser are the ones the tooltip shows
+MARKER_COLUMNS = ["lng", "lat", "name", "type"]
+
+
 def create_geojson_layer(geojson_data):
     """Create a pydeck layer for GeoJSON visualization."""
-    features = geojson_data.get("features", [])
+    # Imported here so sessions that never plan a trip don't pay for loading them
+    import numpy as np
+    import pandas as pd
+    import pydeck as pdk
 
-    # Extract route coordinates
-    route_coords = []
-    waypoint_coords = []
-    overnight_coords = []
+    features = geojson_data.get("features", [])
 
+    # Sort the features into buckets in a single pass, keeping plain tuples per marker
+    route_coords = np.empty((0, 2))
+    buckets = {"waypoint": [], "accommodation": []}
     for feature in features:
-        if feature["geometry"]["type"] == "LineString":
-            # Main route
-            coords = feature["geometry"]["coordinates"]
-            route_coords = [[lng, lat] for lng, lat in coords]
-        elif feature["geometry"]["type"] == "Point":
+        geometry = feature["geometry"]
+        if geometry["type"] == "LineString":
+            # Main route, thinned out for drawing
+            route_coords = np.asarray(
+                simplify_route(geometry["coordinates"], MAP_SIMPLIFY_TOLERANCE), dtype=np.float64
+            )
+        elif geometry["type"] == "Point":
             props = feature["properties"]
-            coord = feature["geometry"]["coordinates"]
-
-            if props.get("type") == "waypoint":
-                waypoint_coords.append({
-                    "coordinates": [coord[0], coord[1]],
-                    "name": props.get("name", "Waypoint"),
-                    "type": "waypoint"
-                })
-            elif props.get("type") == "overnight_accommodation":
-                overnight_coords.append({
-                    "coordinates": [coord[0], coord[1]],
-                    "name": props.get("location_name", "Accommodation"),
-                    "type": "accommodation"
-                })
+            point_type = POINT_TYPES.get(props.get("type"))
+            if point_type:
+                marker_type, name_key, default_name = point_type
+                lng, lat = geometry["coordinates"][:2]
+                buckets[marker_type].append((lng, lat, props.get(name_key, default_name), marker_type))
+
+    waypoint_coords = pd.DataFrame.from_records(buckets["waypoint"], columns=MARKER_COLUMNS)
+    overnight_coords = pd.DataFrame.from_records(buckets["accommodation"], columns=MARKER_COLUMNS)
 
     layers = []
 
-    # Route line layer
-    if route_coords:
-        route_df = pd.DataFrame({"path": [route_coords]})
+    # Route line layer, sent as one flat [lng, lat, lng, lat, ...] array that deck.gl
+    # reads directly instead of normalizing a nested array per vertex
+    if len(route_coords):
         layers.append(
             pdk.Layer(
                 "PathLayer",
-                data=route_df,
+                data=[{"path": route_coords.ravel().tolist()}],
                 get_path="path",
+                position_format=pdk.types.String("XY"),
+                _path_type=pdk.types.String("open"),
                 get_width=5,
                 get_color=[51, 128, 255],
                 width_scale=20,
@@ -105,13 +135,12 @@ def create_geojson_layer(geojson_data):
         )
 
     # Waypoint markers
-    if waypoint_coords:
-        waypoint_df = pd.DataFrame(waypoint_coords)
+    if not waypoint_coords.empty:
         layers.append(
             pdk.Layer(
                 "ScatterplotLayer",
-                data=waypoint_df,
-                get_position="coordinates",
+                data=waypoint_coords,
+                get_position="[lng, lat]",
                 get_color=[255, 165, 0],
                 get_radius=1000,
                 radius_scale=1,
@@ -120,13 +149,12 @@ def create_geojson_layer(geojson_data):
         )
 
     # Overnight accommodation markers
-    if overnight_coords:
-        overnight_df = pd.DataFrame(overnight_coords)
+    if not overnight_coords.empty:
         layers.append(
             pdk.Layer(
                 "ScatterplotLayer",
-                data=overnight_df,
-                get_position="coordinates",
+                data=overnight_coords,
+                get_position="[lng, lat]",
                 get_color=[255, 75, 75],
                 get_radius=1500,
                 radius_scale=1,
@@ -137,6 +165,192 @@ def create_geojson_layer(geojson_data):
     return layers, route_coords
 
 
+def compute_total_distance(directions):
+    """Return the total route distance in km."""
+    total_distance, _ = route_totals(directions)
+    return total_distance
+
+
+def build_route_map(geojson_data):
+    """
+    Build the map for a trip's GeoJSON as standalone deck.gl HTML.
+
+    The result is stored in the trip's session state so reruns triggered by other
+    widgets reuse it instead of walking the features and serializing the deck again.
+    The HTML is embedded with components.html, which renders the deck directly rather
+    than going through st.pydeck_chart's JSON bridge on every rerun.
+    """
+    import pydeck as pdk
+
+    layers, route_coords = create_geojson_layer(geojson_data)
+
+    route_map = {"layers": layers, "route_coords": route_coords}
+    if len(route_coords):
+        center_lng, center_lat = route_coords.mean(axis=0)
+        route_map["center_lat"] = float(center_lat)
+        route_map["center_lng"] = float(center_lng)
+
+        # The embedded HTML gets no token from Streamlit, so only use Mapbox when one is
+        # configured and otherwise fall back to CARTO's tokenless road basemap
+        mapbox_token = os.getenv("MAPBOX_API_KEY", "")
+        if mapbox_token:
+            basemap = {
+                "map_provider": "mapbox",
+                "map_style": "mapbox://styles/mapbox/outdoors-v11",
+                "api_keys": {"mapbox": mapbox_token},
+            }
+        else:
+            basemap = {"map_provider": "carto", "map_style": pdk.map_styles.CARTO_ROAD}
+
+        deck = pdk.Deck(
+            **basemap,
+            initial_view_state=pdk.ViewState(
+                latitude=route_map["center_lat"],
+                longitude=route_map["center_lng"],
+                zoom=10,
+                pitch=0,
+            ),
+            layers=layers,
+            tooltip={
+                "text": "{name}\nType: {type}"  # type: ignore
+            }
+        )
+        route_map["deck"] = deck
+        route_map["html"] = deck.to_html(as_string=True, notebook_display=False)
+    return route_map
+
+
+def cached_route_map(geojson_data, geojson_bytes):
+    """
+    Return the route map for geojson_data, reusing a stored one if the route is unchanged.
+
+    geojson_bytes is the serialized GeoJSON from dump_geojson, used as the cache key.
+
+    Planning the same trip again (for example with cached API responses) produces the
+    same GeoJSON, in which case the stored Deck and its HTML are kept instead of rebuilt.
+    """
+    key = hashlib.sha1(geojson_bytes).hexdigest()
+    previous = st.session_state.get("trip_data", {}).get("route_map")
+    if previous and previous.get("key") == key:
+        return previous
+
+    return _route_map_for_key(key, geojson_data)
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _route_map_for_key(key, _geojson_data):
+    """
+    Build the route map, cached on the GeoJSON digest rather than by hashing the dict.
+
+    Kept as a shared resource so every hit hands back the same Deck instead of
+    unpickling a copy; the map is never modified after it is built.
+    """
+    route_map = build_route_map(_geojson_data)
+    route_map["key"] = key
+    return route_map
+
+
+def render_trip(trip_data, openai_key):
+    """Render a planned trip's metrics, plan, feedback form and route map."""
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Total Distance", f"{trip_data['total_distance']:.1f} km")
+    with col2:
+        departure_date = trip_data.get('departure_date')
+        if departure_date:
+            st.metric("Departure Date", departure_date)
+        else:
+            st.metric("Departure Date", "Not specified")
+
+    # Create tabs for better layout
+    tab1, tab2 = st.tabs(["📄 Trip Plan", "🗺️ Route Map"])
+
+    with tab1:
+        st.markdown(trip_data['trip_plan'])
+
+        # Download button for markdown
+        st.download_button(
+            label="💾 Download Trip Plan",
+            data=trip_data['trip_plan'],
+            file_name=f"dirtgenie_trip_{trip_data['file_stem']}.md",
+            mime="text/markdown"
+        )
+
+        # Feedback section
+        render_feedback(trip_data, openai_key)
+
+    with tab2:
+        render_route_map(trip_data)
+
+
+@st.fragment
+def render_feedback(trip_data, openai_key):
+    """
+    Render the feedback form that revises the current trip plan.
+
+    Runs as a fragment, so typing feedback only reruns this form rather than the
+    whole page with its map and plan.
+    """
+    st.header("💬 Feedback & Revisions")
+    feedback = st.text_area(
+        "Any changes you'd like to make to this plan?",
+        placeholder="e.g., 'I'd prefer more camping options instead of hotels' or 'Can we add more scenic stops along the route?' or 'The daily distances seem too long for my fitness level'",
+        help="Provide specific feedback about what you'd like to change in your trip plan"
+    )
+
+    feedback = feedback.strip()
+
+    if st.button("🔄 Revise Plan", disabled=not feedback):
+        # The current plan already reflects this feedback, so don't resend it
+        if feedback == trip_data.get('last_feedback'):
+            st.info("ℹ️ This feedback has already been applied to the plan above.")
+            return
+
+        with st.spinner("🤖 Revising your trip plan based on feedback..."):
+            try:
+                revised_plan = revise_trip_plan_with_feedback(
+                    trip_data['trip_plan'], feedback, trip_data['start_location'],
+                    trip_data['end_location'], trip_data['nights'], trip_data['preferences'],
+                    trip_data['itinerary'], trip_data['directions'], trip_data.get('departure_date'),
+                    client=openai_client_for_key(openai_key)
+                )
+                trip_data['trip_plan'] = revised_plan
+                trip_data['last_feedback'] = feedback
+                st.success("✅ Plan revised! The updated trip plan is shown above.")
+            except Exception as e:
+                st.error(f"❌ Error revising plan: {str(e)}")
+                return
+        # Rerun the whole app so the plan above shows the revision
+        st.rerun()
+
+
+@st.fragment
+def render_route_map(trip_data):
+    """Render the route map tab as a fragment that other widgets don't rerun."""
+    route_map = trip_data['route_map']
+
+    if "html" in route_map:
+        components.html(route_map["html"], height=MAP_HEIGHT)
+
+        # Legend
+        st.markdown("""
+        **Map Legend:**
+        - 🔵 Blue line: Bike route
+        - 🟠 Orange dots: Waypoints
+        - 🔴 Red dots: Overnight accommodation
+        """)
+    else:
+        st.warning("⚠️ Could not generate map visualization")
+
+    # Download button for GeoJSON
+    st.download_button(
+        label="💾 Download Route Data (GeoJSON)",
+        data=trip_data['geojson_bytes'],
+        file_name=f"dirtgenie_route_{trip_data['file_stem']}.geojson",
+        mime="application/json"
+    )
+
+
 def main():
     """Main Streamlit app."""
     st.set_page_config(
@@ -171,9 +385,9 @@ def main():
         help="Required for route directions"
     )
 
-    # Set API keys in environment
+    # The keys stay local to this session; they are passed to the planner with each call
+    # rather than written to the process-wide environment shared by every session
     if openai_key and google_key:
-        set_api_keys(openai_key, google_key)
         st.sidebar.success("✅ API Keys configured")
     else:
         st.sidebar.warning("⚠️ Please enter both API keys")
@@ -220,30 +434,30 @@ def main():
     # Profile preferences
     st.header("🏕️ Trip Preferences")
 
-    # Load default profile for prefilled values
-    default_profile = create_default_profile()
+    # Prefill from the default profile
+    default_profile = DEFAULT_PROFILE
 
     col1, col2 = st.columns(2)
 
     with col1:
         accommodation = st.selectbox(
             "Accommodation Preference",
-            options=["camping", "hotels", "mixed"],
-            index=["camping", "hotels", "mixed"].index(default_profile["accommodation"]),
+            options=ACCOMMODATION_OPTIONS,
+            index=ACCOMMODATION_INDEX[default_profile["accommodation"]],
             help="Type of accommodation you prefer"
         )
 
         fitness_level = st.selectbox(
             "Fitness Level",
-            options=["beginner", "intermediate", "advanced"],
-            index=["beginner", "intermediate", "advanced"].index(default_profile["fitness_level"]),
+            options=FITNESS_OPTIONS,
+            index=FITNESS_INDEX[default_profile["fitness_level"]],
             help="Your cycling fitness level"
         )
 
         terrain = st.selectbox(
             "Terrain Preference",
-            options=["paved", "gravel", "mixed", "challenging"],
-            index=["paved", "gravel", "mixed", "challenging"].index(default_profile["terrain"]),
+            options=TERRAIN_OPTIONS,
+            index=TERRAIN_INDEX[default_profile["terrain"]],
             help="Type of terrain you prefer to ride"
         )
 
@@ -264,8 +478,8 @@ def main():
 
         budget = st.selectbox(
             "Budget Range",
-            options=["budget", "moderate", "luxury"],
-            index=["budget", "moderate", "luxury"].index(default_profile["budget"]),
+            options=BUDGET_OPTIONS,
+            index=BUDGET_INDEX[default_profile["budget"]],
             help="Your daily budget range"
         )
 
@@ -319,11 +533,11 @@ def main():
             display_tire_size = tire_size
 
         # Show tire capability info
-        if "700x" in display_tire_size and any(x in display_tire_size.lower() for x in ["23", "25", "28"]):
+        if ROAD_TIRE_RE.search(display_tire_size):
             st.info("🏁 **Road bike setup** - Best for paved roads and smooth surfaces")
-        elif "700x" in display_tire_size or "650b x 47" in display_tire_size or any(x in display_tire_size for x in ["32", "35", "40"]):
+        elif GRAVEL_TIRE_RE.search(display_tire_size):
             st.info("🛤️ **Gravel bike setup** - Great for mixed terrain, gravel roads, and light trails")
-        elif any(x in display_tire_size for x in ["2.1", "2.25", "2.35", "2.8"]):
+        elif MOUNTAIN_TIRE_RE.search(display_tire_size):
             st.info("🏔️ **Mountain bike setup** - Perfect for trails, singletrack, and challenging terrain")
         else:
             st.info("🚴 **Custom setup** - Route recommendations will be customized to your tire size")
@@ -336,7 +550,7 @@ def main():
             st.error("❌ Please enter both start and end locations")
             return
 
-        if not validate_api_keys():
+        if not validate_api_keys(openai_key, google_key):
             st.error("❌ Please configure your API keys in the sidebar")
             return
 
@@ -359,35 +573,49 @@ def main():
         status_text = st.empty()
 
         try:
-            # Initialize clients
+            # Initialize clients; they are shared per API key, so repeat plans reuse connections
             status_text.text("🔧 Initializing API clients...")
             progress_bar.progress(10)
-            initialize_clients()
+            # The planner keeps one client per key, so reruns reuse their HTTP sessions
+            llm_client = openai_client_for_key(openai_key)
+            maps_client = gmaps_client_for_key(google_key)
 
             # Step 1: Plan the itinerary
             status_text.text("🧠 Planning your tour itinerary...")
             progress_bar.progress(30)
-            itinerary = plan_tour_itinerary(start_location, end_location, nights, preferences, [], departure_date_str)
+            # The planner caches successful itineraries and directions itself, and never its fallbacks
+            itinerary = plan_tour_itinerary(start_location, end_location, nights, preferences, [],
+                                            departure_date_str, client=llm_client, gmaps_client=maps_client)
 
             # Step 2: Get route directions
             status_text.text("🗺️ Getting bicycle route information...")
             progress_bar.progress(50)
-            directions = get_multi_waypoint_directions(itinerary)
+            directions = get_multi_waypoint_directions(itinerary, gmaps_client=maps_client)
 
             if not directions or 'legs' not in directions:
                 st.error("❌ Could not find a bicycle route between the specified locations")
                 return
 
-            # Step 3: Generate detailed trip plan
-            status_text.text("📝 Generating detailed trip plan...")
+            # Steps 3 and 4: Generate the detailed trip plan and the GeoJSON
+            status_text.text("📝 Generating detailed trip plan and route visualization...")
             progress_bar.progress(70)
-            trip_plan = generate_trip_plan(start_location, end_location, nights,
-                                           preferences, itinerary, directions, departure_date_str)
-
-            # Step 4: Create GeoJSON
-            status_text.text("📍 Creating route visualization...")
-            progress_bar.progress(90)
-            geojson_data = create_geojson(start_location, end_location, directions, preferences, trip_plan, itinerary)
+            # Both only read the itinerary and directions, so the GeoJSON (which may geocode
+            # overnight stops) is built on a worker thread while the plan streams in
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                geojson_future = executor.submit(create_geojson, start_location, end_location, directions,
+                                                 preferences, itinerary=itinerary, gmaps_client=maps_client)
+
+                # Show the plan as it is written; the tabs below replace this preview
+                plan_preview = st.empty()
+                with plan_preview.container():
+                    trip_plan = st.write_stream(stream_trip_plan(
+                        start_location, end_location, nights, preferences, itinerary, directions,
+                        departure_date_str, client=llm_client
+                    ))
+                geojson_data = geojson_future.result()
+
+            plan_preview.empty()
+            trip_plan = trip_plan.strip()
 
             progress_bar.progress(100)
             status_text.text("✅ Trip planning complete!")
@@ -395,23 +623,12 @@ def main():
             # Display results
             st.success("🎉 Your adventure has been planned!")
 
-            # Calculate total distance
-            total_distance = sum(leg['distance']['value'] for leg in directions['legs']) / 1000
-
-            # Display trip metrics
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric("Total Distance", f"{total_distance:.1f} km")
-            with col2:
-                if departure_date_str:
-                    st.metric("Departure Date", departure_date_str)
-                else:
-                    st.metric("Departure Date", "Not specified")
+            # Compute the distance, GeoJSON download and map once; reruns reuse them from the session state
+            total_distance = compute_total_distance(directions)
+            geojson_bytes = dump_geojson(geojson_data)
+            route_map = cached_route_map(geojson_data, geojson_bytes)
 
             # Store data in session state for feedback functionality
-            if 'trip_data' not in st.session_state:
-                st.session_state.trip_data = {}
-
             st.session_state.trip_data = {
                 'start_location': start_location,
                 'end_location': end_location,
@@ -421,88 +638,15 @@ def main():
                 'itinerary': itinerary,
                 'directions': directions,
                 'trip_plan': trip_plan,
-                'geojson_data': geojson_data
+                'geojson_data': geojson_data,
+                'geojson_bytes': geojson_bytes,
+                'total_distance': total_distance,
+                'route_map': route_map,
+                # Fixed at generation so reruns keep the same download file names
+                'file_stem': f"{start_location.replace(' ', '_')}_to_{end_location.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             }
 
-            # Create tabs for better layout
-            tab1, tab2 = st.tabs(["📄 Trip Plan", "🗺️ Route Map"])
-
-            with tab1, st.container(border=True):
-                st.markdown(trip_plan)
-
-                # Download button for markdown
-                st.download_button(
-                    label="💾 Download Trip Plan",
-                    data=trip_plan,
-                    file_name=f"dirtgenie_trip_{start_location.replace(' ', '_')}_to_{end_location.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                    mime="text/markdown"
-                )
-
-                # Feedback section
-                st.header("💬 Feedback & Revisions")
-                feedback = st.text_area(
-                    "Any changes you'd like to make to this plan?",
-                    placeholder="e.g., 'I'd prefer more camping options instead of hotels' or 'Can we add more scenic stops along the route?' or 'The daily distances seem too long for my fitness level'",
-                    help="Provide specific feedback about what you'd like to change in your trip plan"
-                )
-
-                if st.button("🔄 Revise Plan", disabled=not feedback):
-                    with st.spinner("🤖 Revising your trip plan based on feedback..."):
-                        try:
-                            revised_plan = revise_trip_plan_with_feedback(
-                                trip_plan, feedback, start_location, end_location,
-                                nights, preferences, itinerary, directions, departure_date_str
-                            )
-                            st.session_state.trip_data['trip_plan'] = revised_plan
-                            st.success("✅ Plan revised! Check the updated trip plan above.")
-                        except Exception as e:
-                            st.error(f"❌ Error revising plan: {str(e)}")
-                            return
-                        st.rerun()
-
-            with tab2:
-                # Create map visualization
-                layers, route_coords = create_geojson_layer(geojson_data)
-
-                if route_coords:
-                    # Calculate map center
-                    center_lat = sum(coord[1] for coord in route_coords) / len(route_coords)
-                    center_lng = sum(coord[0] for coord in route_coords) / len(route_coords)
-
-                    # Create deck
-                    deck = pdk.Deck(
-                        map_style='mapbox://styles/mapbox/outdoors-v11',
-                        initial_view_state=pdk.ViewState(
-                            latitude=center_lat,
-                            longitude=center_lng,
-                            zoom=10,
-                            pitch=0,
-                        ),
-                        layers=layers,
-                        tooltip={
-                            "text": "{name}\nType: {type}"  # type: ignore
-                        }
-                    )
-
-                    st.pydeck_chart(deck)
-
-                    # Legend
-                    st.markdown("""
-                    **Map Legend:**
-                    - 🔵 Blue line: Bike route
-                    - 🟠 Orange dots: Waypoints
-                    - 🔴 Red dots: Overnight accommodation
-                    """)
-                else:
-                    st.warning("⚠️ Could not generate map visualization")
-
-                # Download button for GeoJSON
-                st.download_button(
-                    label="💾 Download Route Data (GeoJSON)",
-                    data=json.dumps(geojson_data, indent=2),
-                    file_name=f"dirtgenie_route_{start_location.replace(' ', '_')}_to_{end_location.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.geojson",
-                    mime="application/json"
-                )
+            render_trip(st.session_state.trip_data, openai_key)
 
         except Exception as e:
             st.error(f"❌ Error generating trip plan: {str(e)}")
@@ -514,101 +658,7 @@ def main():
     # Display existing trip if it's in session state (for continued feedback)
     elif 'trip_data' in st.session_state and st.session_state.trip_data:
         st.header("📋 Your Current Trip Plan")
-        trip_data = st.session_state.trip_data
-
-        # Display current trip metrics
-        total_distance = sum(leg['distance']['value'] for leg in trip_data['directions']['legs']) / 1000
-
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric("Total Distance", f"{total_distance:.1f} km")
-        with col2:
-            departure_date = trip_data.get('departure_date')
-            if departure_date:
-                st.metric("Departure Date", departure_date)
-            else:
-                st.metric("Departure Date", "Not specified")
-
-        # Create tabs for better layout
-        tab1, tab2 = st.tabs(["📄 Trip Plan", "🗺️ Route Map"])
-
-        with tab1:
-            st.markdown(trip_data['trip_plan'])
-
-            # Download button for markdown
-            st.download_button(
-                label="💾 Download Trip Plan",
-                data=trip_data['trip_plan'],
-                file_name=f"dirtgenie_trip_{trip_data['start_location'].replace(' ', '_')}_to_{trip_data['end_location'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                mime="text/markdown"
-            )
-
-            # Feedback section
-            st.header("💬 Feedback & Revisions")
-            feedback = st.text_area(
-                "Any changes you'd like to make to this plan?",
-                placeholder="e.g., 'I'd prefer more camping options instead of hotels' or 'Can we add more scenic stops along the route?' or 'The daily distances seem too long for my fitness level'",
-                help="Provide specific feedback about what you'd like to change in your trip plan"
-            )
-
-            if st.button("🔄 Revise Plan", disabled=not feedback):
-                with st.spinner("🤖 Revising your trip plan based on feedback..."):
-                    try:
-                        revised_plan = revise_trip_plan_with_feedback(
-                            trip_data['trip_plan'], feedback, trip_data['start_location'],
-                            trip_data['end_location'], trip_data['nights'], trip_data['preferences'],
-                            trip_data['itinerary'], trip_data['directions'], trip_data.get('departure_date')
-                        )
-                        st.session_state.trip_data['trip_plan'] = revised_plan
-                        st.success("✅ Plan revised! The updated trip plan is shown above.")
-                    except Exception as e:
-                        st.error(f"❌ Error revising plan: {str(e)}")
-                        return
-                    st.rerun()
-
-        with tab2:
-            # Create map visualization
-            layers, route_coords = create_geojson_layer(trip_data['geojson_data'])
-
-            if route_coords:
-                # Calculate map center
-                center_lat = sum(coord[1] for coord in route_coords) / len(route_coords)
-                center_lng = sum(coord[0] for coord in route_coords) / len(route_coords)
-
-                # Create deck
-                deck = pdk.Deck(
-                    map_style='mapbox://styles/mapbox/outdoors-v11',
-                    initial_view_state=pdk.ViewState(
-                        latitude=center_lat,
-                        longitude=center_lng,
-                        zoom=10,
-                        pitch=0,
-                    ),
-                    layers=layers,
-                    tooltip={
-                        "text": "{name}\nType: {type}"  # type: ignore
-                    }
-                )
-
-                st.pydeck_chart(deck)
-
-                # Legend
-                st.markdown("""
-                **Map Legend:**
-                - 🔵 Blue line: Bike route
-                - 🟠 Orange dots: Waypoints
-                - 🔴 Red dots: Overnight accommodation
-                """)
-            else:
-                st.warning("⚠️ Could not generate map visualization")
-
-            # Download button for GeoJSON
-            st.download_button(
-                label="💾 Download Route Data (GeoJSON)",
-                data=json.dumps(trip_data['geojson_data'], indent=2),
-                file_name=f"dirtgenie_route_{trip_data['start_location'].replace(' ', '_')}_to_{trip_data['end_location'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.geojson",
-                mime="application/json"
-            )
+        render_trip(st.session_state.trip_data, openai_key)
 
     # Footer
     st.markdown("---")
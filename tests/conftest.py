@@ -0,0 +1,6 @@
+"""Shared pytest configuration for the DirtGenie tests."""
+
+import os
+
+# Keep mocked API responses out of the user's on-disk response caches
+os.environ.setdefault("DIRTGENIE_DISABLE_CACHE", "1")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test script for the FastAPI backend's trip revision endpoint.
+Planner calls are mocked, so no API keys are needed.
+"""
+
+import asyncio
+import importlib.util
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add the src directory to the path so we can import our module
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+import dirtgenie.cache
+
+pytest.importorskip("fastapi")
+
+BACKEND_MAIN = Path(__file__).parent.parent / "web" / "backend" / "main.py"
+
+ITINERARY = {"itinerary": {"day_1": {"start_location": "Boston, MA", "end_location": "Portland, ME"}}}
+DIRECTIONS = {"legs": [{"distance": {"value": 180000}, "duration": {"value": 36000}}]}
+
+
+def load_backend():
+    """Import web/backend/main.py under its own module name."""
+    spec = importlib.util.spec_from_file_location("dirtgenie_backend", BACKEND_MAIN)
+    backend = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(backend)
+    return backend
+
+
+def revision_request(backend, trip_id):
+    return backend.TripRevisionRequest(
+        original_plan="# Original plan",
+        feedback="Add a rest day",
+        trip_request=backend.TripPlanRequest(start_location="Boston, MA", end_location="Portland, ME", nights=1,
+                                             preferences=backend.TripPreferences()),
+        trip_id=trip_id,
+    )
+
+
+def test_revise_trip_reuses_stored_trip():
+    """Test that a revision reuses a stored trip's itinerary and directions, and re-plans otherwise."""
+
+    backend = load_backend()
+
+    with tempfile.TemporaryDirectory() as cache_dir, \
+            patch.object(dirtgenie.cache, "CACHE_DIR", Path(cache_dir)), \
+            patch.object(dirtgenie.cache, "CACHE_DISABLED", False), \
+            patch.object(backend, "plan_tour_itinerary", return_value=ITINERARY) as plan, \
+            patch.object(backend, "get_multi_waypoint_directions", return_value=DIRECTIONS) as directions, \
+            patch.object(backend, "revise_trip_plan_with_feedback", return_value="# Revised plan"), \
+            patch.object(backend, "create_geojson", return_value={"features": []}):
+        backend.trip_cache = dirtgenie.cache.DiskCache("trips", ttl_seconds=60)
+        backend.remember_trip("trip-1", {"itinerary": ITINERARY, "directions": DIRECTIONS})
+
+        # Hit: the stored trip is reused, even from a fresh instance like another worker's
+        backend.trip_cache = dirtgenie.cache.DiskCache("trips", ttl_seconds=60)
+        response = asyncio.run(backend.revise_trip(revision_request(backend, "trip-1")))
+        assert response.success and response.trip_id == "trip-1"
+        assert response.itinerary == ITINERARY
+        assert response.total_distance == 180
+        plan.assert_not_called()
+        directions.assert_not_called()
+
+        # Miss: an unknown trip is planned again and gets no trip_id back
+        response = asyncio.run(backend.revise_trip(revision_request(backend, "trip-2")))
+        assert response.success and response.trip_id is None
+        assert response.trip_plan == "# Revised plan"
+        plan.assert_called_once()
+        directions.assert_called_once_with(ITINERARY)
+
+    print("✅ Revisions reuse stored trips and re-plan unknown ones")
+
+
+if __name__ == "__main__":
+    test_revise_trip_reuses_stored_trip()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent response cache.
+"""
+
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the src directory to the path so we can import our module
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+import dirtgenie.cache
+from dirtgenie.cache import DiskCache
+
+
+def test_disk_cache_round_trip():
+    """Test that cached values survive a fresh cache instance and expire after their TTL."""
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        original_dir = dirtgenie.cache.CACHE_DIR
+        original_disabled = dirtgenie.cache.CACHE_DISABLED
+        dirtgenie.cache.CACHE_DIR = Path(cache_dir)
+        dirtgenie.cache.CACHE_DISABLED = False
+        try:
+            cache = DiskCache("test")
+            assert cache.get("boston, ma") is None
+
+            cache.set("boston, ma", [-71.0589, 42.3601])
+            assert cache.get("boston, ma") == [-71.0589, 42.3601]
+
+            # A new instance has an empty memory LRU, so this reads from disk
+            assert DiskCache("test").get("boston, ma") == [-71.0589, 42.3601]
+
+            # Entries older than the TTL are ignored
+            assert DiskCache("test", ttl_seconds=-1).get("boston, ma") is None
+        finally:
+            dirtgenie.cache.CACHE_DIR = original_dir
+            dirtgenie.cache.CACHE_DISABLED = original_disabled
+
+    print("✅ Disk cache round trip works")
+
+
+def test_disk_cache_expires_memory_and_disk_entries():
+    """Test that expired entries aren't served from memory and are purged from disk."""
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        original_dir = dirtgenie.cache.CACHE_DIR
+        original_disabled = dirtgenie.cache.CACHE_DISABLED
+        dirtgenie.cache.CACHE_DIR = Path(cache_dir)
+        dirtgenie.cache.CACHE_DISABLED = False
+        try:
+            cache = DiskCache("test", ttl_seconds=60)
+            cache.set("boston, ma", [-71.0589, 42.3601])
+            assert cache.get("boston, ma") == [-71.0589, 42.3601]
+
+            later = time.time() + 120
+            with patch.object(dirtgenie.cache.time, "time", return_value=later):
+                # The in-memory copy expires along with the row on disk
+                assert cache.get("boston, ma") is None
+
+                # Opening the database again deletes the expired row
+                assert DiskCache("test", ttl_seconds=60).get("boston, ma") is None
+
+            with sqlite3.connect(str(cache.path)) as conn:
+                assert conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 0
+
+            # A long-lived instance also purges from set() once a TTL period has passed
+            cache.set("boston, ma", [-71.0589, 42.3601])
+            with patch.object(dirtgenie.cache.time, "time", return_value=time.time() + 120):
+                cache.set("portland, me", [-70.2568, 43.6591])
+            with sqlite3.connect(str(cache.path)) as conn:
+                assert conn.execute("SELECT key FROM cache").fetchall() == [("portland, me",)]
+        finally:
+            dirtgenie.cache.CACHE_DIR = original_dir
+            dirtgenie.cache.CACHE_DISABLED = original_disabled
+
+    print("✅ Disk cache expires entries in memory and on disk")
+
+
+def test_disk_cache_falls_back_to_memory():
+    """Test that an unwritable cache directory or unserializable value only disables the disk."""
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        original_dir = dirtgenie.cache.CACHE_DIR
+        original_disabled = dirtgenie.cache.CACHE_DISABLED
+        # A directory can't be created inside a regular file, even when running as root
+        blocker = Path(cache_dir) / "not-a-directory"
+        blocker.write_text("")
+        dirtgenie.cache.CACHE_DIR = blocker / "cache"
+        dirtgenie.cache.CACHE_DISABLED = False
+        try:
+            cache = DiskCache("test")
+            assert cache.get("boston, ma") is None
+
+            cache.set("boston, ma", [-71.0589, 42.3601])
+            assert cache.get("boston, ma") == [-71.0589, 42.3601]
+
+            dirtgenie.cache.CACHE_DIR = Path(cache_dir)
+            cache = DiskCache("test")
+            cache.set("portland, me", {"location": object()})
+            assert "location" in cache.get("portland, me")
+            assert DiskCache("test").get("portland, me") is None
+        finally:
+            dirtgenie.cache.CACHE_DIR = original_dir
+            dirtgenie.cache.CACHE_DISABLED = original_disabled
+
+    print("✅ Disk cache falls back to memory")
+
+
+if __name__ == "__main__":
+    test_disk_cache_round_trip()
+    test_disk_cache_expires_memory_and_disk_entries()
+    test_disk_cache_falls_back_to_memory()
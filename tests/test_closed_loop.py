@@ -15,20 +15,65 @@ from dirtgenie.planner import (create_geojson, generate_trip_plan, get_multi_way
 import dirtgenie.planner
 import sys
 import tempfile
-from unittest.mock import MagicMock, patch
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from unittest.mock import patch
 
 # Add the current directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 
+@dataclass
+class FakeMessage:
+    content: str
+
+
+@dataclass
+class FakeChoice:
+    message: FakeMessage
+
+
+@dataclass
+class FakeResponse:
+    choices: list
+
+
+@dataclass
+class FakeOpenAIClient:
+    """Stands in for the OpenAI client, returning one response and recording each request."""
+
+    response: FakeResponse
+    requests: list = field(default_factory=list)
+
+    def __post_init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.requests.append(kwargs)
+        return self.response
+
+
+# Shared by the tests below; the planner only reads it
+TEST_PROFILE = {
+    'fitness_level': 'intermediate',
+    'daily_distance_preference': 'moderate (40-60 miles)',
+    'terrain_preference': 'mixed',
+    'accommodation_preference': 'camping',
+    'trip_style': 'scenic',
+    'special_interests': ['nature', 'small towns']
+}
+
+
+def fake_response(content):
+    """Build a chat completion response with a single message."""
+    return FakeResponse(choices=[FakeChoice(message=FakeMessage(content=content))])
+
+
 def test_closed_loop_detection():
     """Test that closed-loop tours are detected correctly."""
 
     # Mock OpenAI response for a closed-loop tour
-    mock_closed_loop_response = {
-        "choices": [{
-            "message": {
-                "content": """Here's a balanced 3-day closed-loop bikepacking tour:
+    mock_closed_loop_response = fake_response("""Here's a balanced 3-day closed-loop bikepacking tour:
 
 **Day 1: Cambridge, MA to Concord, MA (25 miles)**
 - Start: Cambridge, MA
@@ -47,10 +92,7 @@ def test_closed_loop_detection():
 - Route: Return via scenic route through Belmont and Arlington
 - End: Cambridge, MA (completing the loop)
 
-This creates a balanced triangle route with manageable daily distances."""
-            }
-        }]
-    }
+This creates a balanced triangle route with manageable daily distances.""")
 
     # Mock Google Maps response with waypoints
     mock_directions_response = {
@@ -82,21 +124,10 @@ This creates a balanced triangle route with manageable daily distances."""
         }]
     }
 
-    # Test profile
-    test_profile = {
-        'fitness_level': 'intermediate',
-        'daily_distance_preference': 'moderate (40-60 miles)',
-        'terrain_preference': 'mixed',
-        'accommodation_preference': 'camping',
-        'trip_style': 'scenic',
-        'special_interests': ['nature', 'small towns']
-    }
-
     print("Testing closed-loop tour detection and planning...")
 
     # Mock the global OpenAI client
-    mock_openai_client = MagicMock()
-    mock_openai_client.chat.completions.create.return_value = mock_closed_loop_response
+    mock_openai_client = FakeOpenAIClient(mock_closed_loop_response)
 
     with patch.object(dirtgenie.planner, 'openai_client', mock_openai_client):
         with patch('requests.get') as mock_requests:
@@ -112,15 +143,14 @@ This creates a balanced triangle route with manageable daily distances."""
 
             # This should detect it's a closed loop and use the closed-loop prompt
             itinerary = plan_tour_itinerary(
-                start_location, end_location, duration_days, test_profile
+                start_location, end_location, duration_days, TEST_PROFILE
             )
 
             print("✅ Itinerary planning completed")
             print("Itinerary preview:", str(itinerary)[:200] + "..." if len(str(itinerary)) > 200 else str(itinerary))
 
             # Verify the OpenAI call was made with closed-loop specific prompt
-            args, kwargs = mock_openai_client.chat.completions.create.call_args
-            prompt_content = kwargs['messages'][0]['content']
+            prompt_content = mock_openai_client.requests[-1]['messages'][0]['content']
 
             # Check that closed-loop specific language was used
             assert "closed-loop" in prompt_content.lower() or "loop" in prompt_content.lower(), \
@@ -157,20 +187,20 @@ This creates a balanced triangle route with manageable daily distances."""
 
             # Test trip plan generation - need proper function signature
             print("Generating complete trip plan...")
-            trip_plan = generate_trip_plan(start_location, end_location, duration_days, test_profile, itinerary, directions)
+            trip_plan = generate_trip_plan(start_location, end_location, duration_days, TEST_PROFILE, itinerary, directions)
 
             print("✅ Trip plan generation completed")
             print("Trip plan preview:", trip_plan[:300] + "..." if len(trip_plan) > 300 else trip_plan)
 
             # Test GeoJSON creation - need proper function signature
             print("Creating GeoJSON...")
-            geojson = create_geojson(start_location, end_location, directions, test_profile, trip_plan, itinerary)
+            geojson = create_geojson(start_location, end_location, directions, TEST_PROFILE, trip_plan, itinerary)
 
             print("✅ GeoJSON creation completed")
             print(f"GeoJSON features: {len(geojson['features'])}")
 
             # Verify we have overnight markers
-            overnight_features = [f for f in geojson['features'] if f['properties'].get('type') == 'overnight']
+            overnight_features = [f for f in geojson['features'] if f['properties'].get('type') == 'overnight_accommodation']
             print(f"Overnight markers: {len(overnight_features)}")
 
             assert len(overnight_features) > 0, "Should have overnight markers"
@@ -182,37 +212,20 @@ This creates a balanced triangle route with manageable daily distances."""
 def test_point_to_point_vs_closed_loop():
     """Test that different prompts are used for point-to-point vs closed-loop tours."""
 
-    test_profile = {
-        'fitness_level': 'intermediate',
-        'daily_distance_preference': 'moderate (40-60 miles)',
-        'terrain_preference': 'mixed',
-        'accommodation_preference': 'camping',
-        'trip_style': 'scenic',
-        'special_interests': ['nature']
-    }
-
-    mock_response = {
-        "choices": [{
-            "message": {"content": "Mock tour plan"}
-        }]
-    }
+    mock_response = fake_response("Mock tour plan")
 
     print("\nTesting point-to-point vs closed-loop prompt selection...")
 
-    with patch('openai.OpenAI') as mock_openai:
-        mock_client = MagicMock()
-        mock_openai.return_value = mock_client
-        mock_client.chat.completions.create.return_value = mock_response
+    mock_client = FakeOpenAIClient(mock_response)
 
+    with patch.object(dirtgenie.planner, 'openai_client', mock_client):
         # Test point-to-point
-        plan_tour_itinerary("Boston, MA", "Portland, ME", 3, test_profile)
-        p2p_args, p2p_kwargs = mock_client.chat.completions.create.call_args
-        p2p_prompt = p2p_kwargs['messages'][0]['content']
+        plan_tour_itinerary("Boston, MA", "Portland, ME", 3, TEST_PROFILE)
+        p2p_prompt = mock_client.requests[-1]['messages'][0]['content']
 
         # Test closed-loop
-        plan_tour_itinerary("Boston, MA", "Boston, MA", 3, test_profile)
-        loop_args, loop_kwargs = mock_client.chat.completions.create.call_args
-        loop_prompt = loop_kwargs['messages'][0]['content']
+        plan_tour_itinerary("Boston, MA", "Boston, MA", 3, TEST_PROFILE)
+        loop_prompt = mock_client.requests[-1]['messages'][0]['content']
 
         # Verify different prompts are used
         assert p2p_prompt != loop_prompt, "Different prompts should be used for point-to-point vs closed-loop"
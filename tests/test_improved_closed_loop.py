@@ -32,15 +32,13 @@ def test_closed_loop_prompt():
     }
 
     # Import the required modules and set up mocking
+    from types import SimpleNamespace
     from unittest.mock import MagicMock, patch
 
     import dirtgenie.planner
 
     # Mock OpenAI response
-    mock_response = MagicMock()
-    mock_response.choices = [MagicMock()]
-    mock_response.choices[0].message = MagicMock()
-    mock_response.choices[0].message.content = """{
+    content = """{
     "itinerary": {
         "day_1": {
             "start_location": "Cambridge, MA",
@@ -101,6 +99,7 @@ def test_closed_loop_prompt():
     "route_summary": "Closed-loop tour starting and ending at Cambridge, MA, max radius 87km",
     "validation_note": "Each overnight location verified to be returnable within remaining days at 40-50 km/day"
 }"""
+    mock_response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
 
     print("Testing improved closed-loop prompt...")
 
@@ -117,12 +116,14 @@ def test_closed_loop_prompt():
 
             # Check the prompt that was used
             call_args = mock_openai_client.chat.completions.create.call_args
-            prompt = call_args[1]['messages'][0]['content']
+            # Fixed instructions go in the system message, trip details in the user message
+            system_prompt = call_args[1]['messages'][0]['content']
+            prompt = call_args[1]['messages'][1]['content']
 
             # Verify the prompt includes the new improvements
-            assert "Maximum radius calculation" in prompt
+            assert "Maximum radius calculation" in system_prompt
             assert "VALIDATION CHECKLIST" in prompt
-            assert "days_remaining_to_return" in prompt
+            assert "days_remaining_to_return" in system_prompt
             assert "Can you get back to Cambridge, MA" in prompt
 
             print("✅ Improved prompt elements found")
@@ -132,7 +133,7 @@ def test_closed_loop_prompt():
             print("✅ Radius calculation included")
 
             # Verify validation instructions are present
-            assert "distance_from_start_km * 1.4" in prompt
+            assert "distance_from_start_km * 1.4" in system_prompt
             print("✅ Return validation formula included")
 
             print("\n🎉 All improved closed-loop prompt tests passed!")
@@ -4,15 +4,18 @@ Test script for the new intelligent tour planning methodology.
 Tests the 3-step approach: Plan → Route → Generate
 """
 
+import asyncio
 import json
 import sys
 from pathlib import Path
 from typing import Any, Dict
+from unittest.mock import AsyncMock, MagicMock, patch
 
 # Add the src directory to the path so we can import our module
 sys.path.append(str(Path(__file__).parent.parent / "src"))
+import dirtgenie.planner
 from dirtgenie.planner import (create_geojson, extract_overnight_locations, get_multi_waypoint_directions,
-                                 plan_tour_itinerary)
+                                 plan_tour_itinerary, plan_tour_itinerary_async, route_totals)
 
 
 def test_intelligent_planning():
@@ -127,7 +130,8 @@ def test_intelligent_planning():
     }
 
     print(f"✅ Mock multi-waypoint route with {len(mock_directions['legs'])} legs")
-    total_distance = sum(leg['distance']['value'] for leg in mock_directions['legs']) / 1000
+    total_distance, total_hours = route_totals(mock_directions)
+    assert total_distance == sum(leg['distance']['value'] for leg in mock_directions['legs']) / 1000
     print(f"   📏 Total distance: {total_distance} km")
 
     # Test 4: GeoJSON creation with new structured approach
@@ -181,5 +185,67 @@ def test_intelligent_planning():
     return True
 
 
+def test_async_itinerary_planning():
+    """Test that the async planner streams from the AsyncOpenAI client and parses its JSON"""
+
+    itinerary_json = json.dumps({
+        "itinerary": {
+            "day_1": {"start_location": "Boston, MA", "end_location": "Portsmouth, NH"},
+            "day_2": {"start_location": "Portsmouth, NH", "end_location": "Portland, ME"}
+        }
+    })
+    async def mock_stream():
+        # Deliver the JSON in a few pieces like a streamed completion
+        for start in range(0, len(itinerary_json), 40):
+            delta = MagicMock(content=itinerary_json[start:start + 40])
+            yield MagicMock(choices=[MagicMock(delta=delta)])
+
+    mock_client = MagicMock()
+    mock_client.chat.completions.create = AsyncMock(return_value=mock_stream())
+
+    with patch.object(dirtgenie.planner, 'async_openai_client', mock_client):
+        itinerary = asyncio.run(plan_tour_itinerary_async(
+            "Boston, MA", "Portland, ME", 1, {'daily_distance': '60-80'}
+        ))
+
+    mock_client.chat.completions.create.assert_awaited_once()
+    assert mock_client.chat.completions.create.call_args.kwargs["stream"] is True
+    assert itinerary["itinerary"]["day_2"]["end_location"] == "Portland, ME"
+    print("✅ Async itinerary planning parsed the mocked response")
+
+
+def test_itinerary_follows_optimized_waypoint_order():
+    """Test that itinerary days are reordered to match Google's optimized waypoint order"""
+
+    mock_gmaps = MagicMock()
+    mock_gmaps.geocode.return_value = []
+    mock_gmaps.directions.return_value = [{
+        "waypoint_order": [1, 0],
+        "legs": [{"distance": {"value": 1000}, "duration": {"value": 60}, "steps": []}]
+    }]
+    itinerary = {
+        "itinerary": {
+            "day_1": {"start_location": "Boston, MA", "end_location": "Concord, NH"},
+            "day_2": {"start_location": "Concord, NH", "end_location": "Portsmouth, NH"},
+            "day_3": {"start_location": "Portsmouth, NH", "end_location": "Portland, ME"}
+        }
+    }
+
+    with patch.object(dirtgenie.planner, 'gmaps', mock_gmaps):
+        get_multi_waypoint_directions(itinerary)
+
+    days = itinerary["itinerary"]
+    assert mock_gmaps.directions.call_args.kwargs["optimize_waypoints"] is True
+    assert [days[key]["end_location"] for key in sorted(days)] == [
+        "Portsmouth, NH", "Concord, NH", "Portland, ME"
+    ]
+    assert [days[key]["start_location"] for key in sorted(days)] == [
+        "Boston, MA", "Portsmouth, NH", "Concord, NH"
+    ]
+    print("✅ Itinerary reordered to the optimized waypoint order")
+
+
 if __name__ == "__main__":
     test_intelligent_planning()
+    test_async_itinerary_planning()
+    test_itinerary_follows_optimized_waypoint_order()
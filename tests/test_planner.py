@@ -6,12 +6,17 @@ This allows testing the core functionality without API keys
 
 import json
 import sys
+import tempfile
 from datetime import datetime
 from pathlib import Path
+from unittest.mock import MagicMock, patch
 
 # Add the src directory to the path so we can import our module
 sys.path.append(str(Path(__file__).parent.parent / "src"))
-from dirtgenie.planner import ask_follow_up_questions, create_geojson, extract_route_points, save_outputs
+import dirtgenie.planner as planner
+from dirtgenie.planner import (ask_follow_up_questions, create_geojson, extract_overnight_locations,
+                               extract_route_points, save_outputs, simplify_route, stream_trip_plan,
+                               write_geojson)
 
 # Mock Google Maps directions response
 MOCK_DIRECTIONS = {
@@ -148,5 +153,245 @@ def test_core_functionality():
     print(f"python src/dirtgenie/planner.py --start '{start}' --end '{end}' --nights {nights}")
 
 
+def test_simplify_route():
+    """Test that Douglas-Peucker simplification drops collinear points and keeps corners."""
+
+    straight = [(-122.0 + i * 1e-5, 37.0) for i in range(100)]
+    assert simplify_route(straight, 1e-4) == [straight[0], straight[-1]]
+
+    corner = [(-122.0, 37.0), (-121.99, 37.0), (-121.98, 37.0), (-121.98, 37.01)]
+    assert simplify_route(corner, 1e-4) == [corner[0], corner[2], corner[3]]
+
+    # A zero tolerance keeps every point
+    assert simplify_route(straight, 0) == straight
+    print("✅ Route simplification works")
+
+
+def test_decode_polyline_matches_reference():
+    """Test that the polyline decoder agrees with the polyline package, in lng/lat order."""
+
+    import polyline
+
+    points = [(37.7749, -122.4194), (37.77, -122.41), (37.3382, -121.8863), (-33.8688, 151.2093)]
+    encoded = polyline.encode(points)
+
+    assert planner._decode_polyline(encoded) == tuple(polyline.decode(encoded, geojson=True))
+    assert planner._decode_polyline(encoded)[0] == (-122.4194, 37.7749)
+    print("✅ Polyline decoding matches the reference decoder")
+
+
+def test_with_keys_passes_clients_without_touching_globals():
+    """Test that the *_with_keys wrappers inject per-key clients instead of swapping globals."""
+
+    original_gmaps = planner.gmaps
+    maps_client = MagicMock()
+    maps_client.directions.return_value = [MOCK_DIRECTIONS]
+    itinerary = {
+        "itinerary": {
+            "day_1": {"start_location": "San Francisco, CA", "end_location": "Half Moon Bay, CA"},
+        }
+    }
+
+    with patch.object(planner, "gmaps_client_for_key", return_value=maps_client) as factory:
+        directions = planner.get_multi_waypoint_directions_with_keys(itinerary, "user-key")
+
+    factory.assert_called_once_with("user-key")
+    maps_client.directions.assert_called_once()
+    assert directions["legs"] == MOCK_DIRECTIONS["legs"]
+    assert planner.gmaps is original_gmaps
+    print("✅ Per-key clients are injected")
+
+
+def test_overnight_markers_use_leg_end_locations():
+    """Test that overnight markers are placed at leg ends without geocoding."""
+
+    itinerary = {
+        "itinerary": {
+            "day_1": {"start_location": "San Francisco, CA", "end_location": "Half Moon Bay, CA"},
+        }
+    }
+
+    with patch.object(planner, "geocode_locations", return_value={}) as geocode:
+        geojson_data = create_geojson("San Francisco, CA", "Half Moon Bay, CA", MOCK_DIRECTIONS, {},
+                                      itinerary=itinerary)
+
+    geocode.assert_called_once_with([], None)
+    markers = [f for f in geojson_data["features"] if f["geometry"]["type"] == "Point"]
+    end = MOCK_DIRECTIONS["legs"][0]["end_location"]
+    assert markers[0]["geometry"]["coordinates"] == [end["lng"], end["lat"]]
+    print("✅ Overnight markers use leg end locations")
+
+
+def test_write_geojson_round_trip(tmp_path):
+    """Test that the feature-by-feature GeoJSON writer produces the same collection."""
+
+    directory = Path(tmp_path)
+    geojson_data = create_geojson("San Francisco, CA", "San Jose, CA", MOCK_DIRECTIONS, {})
+
+    path = directory / "route.geojson"
+    write_geojson(path, geojson_data)
+    assert json.loads(path.read_text()) == json.loads(json.dumps(geojson_data))
+
+    path = directory / "empty.geojson"
+    write_geojson(path, {"features": []})
+    assert json.loads(path.read_text()) == {"features": []}
+    print("✅ GeoJSON writer round-trips")
+
+
+def test_stream_trip_plan_yields_chunks():
+    """Test that the streaming trip plan yields the completion's chunks as they arrive."""
+
+    def chunk(text):
+        return MagicMock(choices=[MagicMock(delta=MagicMock(content=text))])
+
+    client = MagicMock()
+    client.chat.completions.create.return_value = iter([chunk("# Trip"), chunk(None), chunk(" plan\n")])
+    itinerary = {"itinerary": {"day_1": {"start_location": "San Francisco, CA", "end_location": "San Jose, CA"}}}
+
+    chunks = list(stream_trip_plan("San Francisco, CA", "San Jose, CA", 1, {}, itinerary, MOCK_DIRECTIONS,
+                                   client=client))
+
+    assert chunks == ["# Trip", " plan\n"]
+    assert client.chat.completions.create.call_args[1]["stream"] is True
+    print("✅ Trip plan streams chunk by chunk")
+
+
+def test_itinerary_key_normalizes_locations():
+    """Test that itinerary cache keys ignore location case and spacing but not trip details."""
+
+    preferences = {"daily_distance": "50-80", "terrain": "gravel"}
+    key = planner._itinerary_key("Boston, MA", "Portland, ME", 3, preferences)
+
+    assert planner._itinerary_key("boston,  ma", "PORTLAND, ME", 3, dict(preferences)) == key
+    assert planner._itinerary_key("Boston, MA", "Portland, ME", 4, preferences) != key
+    assert planner._itinerary_key("Boston, MA", "Portland, ME", 3, {**preferences, "terrain": "paved"}) != key
+    print("✅ Itinerary cache keys normalize locations")
+
+
+def test_itinerary_key_ignores_unused_preferences():
+    """Test that preferences the itinerary prompt never reads don't split the cache."""
+
+    preferences = {"daily_distance": "50-80", "terrain": "gravel", "interests": ["nature"]}
+    key = planner._itinerary_key("Boston, MA", "Boston, MA", 3, preferences)
+
+    assert planner._itinerary_key("Boston, MA", "Boston, MA", 3, {**preferences, "trip_style": "scenic"}) == key
+    assert planner._itinerary_key("Boston, MA", "Boston, MA", 3, {**preferences, "daily_distance": "80-100"}) != key
+    assert planner._itinerary_key("Boston, MA", "Boston, MA", 3, {**preferences, "interests": ["food"]}) != key
+    print("✅ Itinerary cache keys ignore unused preferences")
+
+
+def test_unreturnable_closed_loop_days():
+    """Test that closed-loop stops too far out for the remaining days are flagged."""
+
+    itinerary = {
+        "itinerary": {
+            "day_1": {"distance_from_start_km": 40, "days_remaining_to_return": 2},
+            "day_2": {"distance_from_start_km": "120", "days_remaining_to_return": 1},
+            "day_3": {"distance_from_start_km": 0, "days_remaining_to_return": 0},
+        }
+    }
+
+    assert planner._warn_unreturnable_days(itinerary, {"daily_distance": "40-50"}) == ["day_2"]
+    assert planner._warn_unreturnable_days(itinerary, {"daily_distance": "100-180"}) == []
+    print("✅ Unreturnable closed-loop days are flagged")
+
+
+def test_extract_overnight_locations_from_plan_text():
+    """Test that overnight stops are read from the text after the word "at"."""
+
+    trip_plan = """## Day 1
+- Stay at Seacoast Camping Area
+Great campsite by the lake
+Accommodation: Harbor Inn
+Lunch at the bakery"""
+
+    assert extract_overnight_locations(trip_plan) == [
+        "Seacoast Camping Area",
+        "Great campsite by the lake",
+        "Accommodation: Harbor Inn",
+    ]
+    print("✅ Overnight locations extracted from plan text")
+
+
+def test_prompt_formatters_leave_inputs_unchanged():
+    """Test that formatting the route and itinerary for a prompt doesn't add keys to them."""
+
+    itinerary = {"itinerary": {"day_1": {"start_location": "San Francisco, CA", "end_location": "San Jose, CA"}}}
+    directions = json.loads(json.dumps(MOCK_DIRECTIONS))
+
+    assert "Day 1:" in planner.format_itinerary_for_prompt(itinerary)
+    assert "Leg 1:" in planner.format_route_info(directions)
+    assert list(itinerary) == ["itinerary"]
+    assert directions == MOCK_DIRECTIONS
+    print("✅ Prompt formatters leave their inputs unchanged")
+
+
+def test_cached_itinerary_is_not_shared_with_callers():
+    """Test that mutating a returned itinerary doesn't change what the cache returns next."""
+
+    import dirtgenie.cache
+
+    itinerary = {"itinerary": {"day_1": {"start_location": "San Francisco, CA", "end_location": "San Jose, CA"}}}
+    client = MagicMock()
+    client.chat.completions.create.return_value = MagicMock(
+        choices=[MagicMock(message=MagicMock(content=json.dumps(itinerary)))]
+    )
+    maps_client = MagicMock()
+    maps_client.directions.return_value = [MOCK_DIRECTIONS]
+
+    with tempfile.TemporaryDirectory() as cache_dir, \
+            patch.object(dirtgenie.cache, "CACHE_DIR", Path(cache_dir)), \
+            patch.object(dirtgenie.cache, "CACHE_DISABLED", False), \
+            patch.object(planner, "llm_cache", dirtgenie.cache.DiskCache("llm")):
+        first = planner.plan_tour_itinerary("San Francisco, CA", "San Jose, CA", 1, {}, client=client,
+                                            gmaps_client=maps_client)
+        first["itinerary"]["day_1"]["end_location"] = "Gilroy, CA"
+        second = planner.plan_tour_itinerary("San Francisco, CA", "San Jose, CA", 1, {}, client=client,
+                                             gmaps_client=maps_client)
+        second["itinerary"]["day_1"]["end_location"] = "Morgan Hill, CA"
+        third = planner.plan_tour_itinerary("San Francisco, CA", "San Jose, CA", 1, {}, client=client,
+                                            gmaps_client=maps_client)
+
+    client.chat.completions.create.assert_called_once()
+    assert third == itinerary
+    print("✅ Cached itineraries are copied for each caller")
+
+
+def test_reorder_itinerary_keeps_double_digit_days_in_order():
+    """Test that days 10 and up stay after day 9 when an 11-day itinerary is reordered."""
+
+    daily_plans = {
+        f"day_{day}": {"start_location": f"Stop {day - 1}", "end_location": f"Stop {day}"}
+        for day in range(1, 12)
+    }
+    day_keys = planner._sorted_day_keys(daily_plans)
+    assert day_keys == [f"day_{day}" for day in range(1, 12)]
+
+    # Google swaps the first two overnight stops and keeps the rest in place
+    planner._reorder_itinerary(daily_plans, day_keys, [1, 0] + list(range(2, 10)))
+
+    assert [daily_plans[key]["end_location"] for key in day_keys] == (
+        ["Stop 2", "Stop 1"] + [f"Stop {day}" for day in range(3, 12)]
+    )
+    for previous, current in zip(day_keys, day_keys[1:]):
+        assert daily_plans[current]["start_location"] == daily_plans[previous]["end_location"]
+    assert daily_plans["day_1"]["start_location"] == "Stop 0"
+    print("✅ Double-digit days stay in travel order")
+
+
 if __name__ == "__main__":
     test_core_functionality()
+    test_simplify_route()
+    test_decode_polyline_matches_reference()
+    test_with_keys_passes_clients_without_touching_globals()
+    test_overnight_markers_use_leg_end_locations()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_write_geojson_round_trip(tmp_dir)
+    test_stream_trip_plan_yields_chunks()
+    test_itinerary_key_normalizes_locations()
+    test_itinerary_key_ignores_unused_preferences()
+    test_unreturnable_closed_loop_days()
+    test_extract_overnight_locations_from_plan_text()
+    test_prompt_formatters_leave_inputs_unchanged()
+    test_cached_itinerary_is_not_shared_with_callers()
+    test_reorder_itinerary_keeps_double_digit_days_in_order()
@@ -54,8 +54,7 @@ def test_profile_functionality():
 
     finally:
         # Clean up
-        if os.path.exists(test_profile_path):
-            os.unlink(test_profile_path)
+        Path(test_profile_path).unlink(missing_ok=True)
 
     # Test 2: Test default profile behavior
     print("\n2️⃣ Testing default profile behavior...")
@@ -75,18 +74,19 @@ def test_profile_functionality():
     with tempfile.NamedTemporaryFile(suffix='.yml', delete=True) as f:
         missing_profile_path = f.name
 
-    # This should create a default profile
-    prefs = get_user_preferences(interactive=False, profile_path=missing_profile_path)
-    print("✅ Default profile created for missing file")
-    print(f"✅ Profile created at: {missing_profile_path}")
+    try:
+        # This should create a default profile
+        prefs = get_user_preferences(interactive=False, profile_path=missing_profile_path)
+        print("✅ Default profile created for missing file")
+        print(f"✅ Profile created at: {missing_profile_path}")
 
-    # Verify the file was created
-    assert os.path.exists(missing_profile_path)
-    print("✅ Profile file exists after creation")
+        # Verify the file was created
+        assert os.path.exists(missing_profile_path)
+        print("✅ Profile file exists after creation")
 
-    # Clean up
-    if os.path.exists(missing_profile_path):
-        os.unlink(missing_profile_path)
+    finally:
+        # Clean up
+        Path(missing_profile_path).unlink(missing_ok=True)
 
     # Test 4: Test CLI argument structure
     print("\n4️⃣ Testing CLI argument structure...")
@@ -10,17 +10,11 @@ from pathlib import Path
 
 # Add the src directory to the path so we can import our module
 sys.path.append(str(Path(__file__).parent.parent / "src"))
-from dirtgenie.planner import initialize_clients, plan_tour_itinerary
-
-# Load environment from .env if it exists
-env_file = Path(".env")
-if env_file.exists():
-    with open(env_file, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line and not line.startswith('#') and '=' in line:
-                key, value = line.split('=', 1)
-                os.environ[key.strip()] = value.strip()
+import dirtgenie.planner
+from dirtgenie.planner import initialize_clients, load_env, plan_tour_itinerary
+
+# Load environment from .env if it exists (a no-op if the planner already loaded it)
+load_env()
 
 # Add the current directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -38,6 +32,8 @@ def test_with_real_api():
     try:
         # Initialize clients
         initialize_clients()
+        # Every call must reuse this client (and its keep-alive connections)
+        assert dirtgenie.planner.openai_client is not None, "OpenAI client should be created up front"
         print("✅ API clients initialized")
 
         # Test parameters
@@ -5,6 +5,7 @@ Test script to verify web search functionality in the bikepacking planner.
 
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Add the src directory to the path so we can import our module
@@ -133,10 +134,8 @@ def test_web_search_in_trip_generation():
             'operating hours', 'seasonal', 'available', 'booking'
         ]
 
-        found_indicators = []
-        for indicator in search_indicators:
-            if indicator.lower() in trip_plan.lower():
-                found_indicators.append(indicator)
+        plan_text = trip_plan.lower()
+        found_indicators = [indicator for indicator in search_indicators if indicator in plan_text]
 
         if found_indicators:
             print(f"✅ Plan appears to include current information (found: {', '.join(found_indicators)})")
@@ -166,9 +165,11 @@ def main():
 
     print("✅ API keys found")
 
-    # Run tests
-    planning_success = test_web_search_in_planning()
-    generation_success = test_web_search_in_trip_generation()
+    # The two tests are independent API round-trips, so wait on them together
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        planning = executor.submit(test_web_search_in_planning)
+        generation = executor.submit(test_web_search_in_trip_generation)
+        planning_success, generation_success = planning.result(), generation.result()
 
     print("\n" + "=" * 60)
     print("Test Results:")
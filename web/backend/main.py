@@ -1,32 +1,39 @@
+import asyncio
+import hashlib
 import io
-import json
 import os
+import re
 import sys
 import zipfile
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 # Add the src directory to Python path BEFORE imports
 src_path = Path(__file__).parent.parent.parent / "src"
 sys.path.insert(0, str(src_path))
 
+import orjson
 import uvicorn
 from fastapi import BackgroundTasks, FastAPI, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from pydantic import BaseModel, Field
 
+from dirtgenie.cache import DiskCache
 from dirtgenie.planner import (create_default_profile, create_geojson, create_geojson_with_keys, generate_trip_plan,
                                generate_trip_plan_with_keys, get_bicycle_directions, get_multi_waypoint_directions,
                                get_multi_waypoint_directions_with_keys, initialize_clients, load_profile,
                                plan_tour_itinerary, plan_tour_itinerary_with_keys, revise_trip_plan_with_feedback,
-                               save_profile)
+                               route_totals, save_profile)
 
 app = FastAPI(
     title="DirtGenie API",
     description="AI-Powered Bikepacking Trip Planner API",
-    version="1.0.0"
+    version="1.0.0",
+    # Trip responses carry the full GeoJSON route, which orjson encodes much faster
+    default_response_class=ORJSONResponse
 )
 
 # Enable CORS for frontend
@@ -65,6 +72,7 @@ class TripRevisionRequest(BaseModel):
     original_plan: str = Field(..., description="Original trip plan markdown")
     feedback: str = Field(..., description="User feedback for revision")
     trip_request: TripPlanRequest
+    trip_id: Optional[str] = Field(None, description="Trip ID returned when the trip was planned")
 
 
 class TripPlanResponse(BaseModel):
@@ -73,6 +81,7 @@ class TripPlanResponse(BaseModel):
     itinerary: Optional[Dict[str, Any]] = None
     geojson: Optional[Dict[str, Any]] = None
     total_distance: Optional[float] = None
+    trip_id: Optional[str] = None
     error: Optional[str] = None
 
 
@@ -96,8 +105,58 @@ class DownloadRequest(BaseModel):
     end_location: Optional[str] = Field(None, description="End location")
 
 
-# Global variables for storing trip data (in production, use a proper database)
-trip_cache = {}
+# Planned trips kept for revisions. The API runs several uvicorn workers, so trips live
+# in SQLite under DIRTGENIE_CACHE_DIR where every worker can read them; expired rows are
+# purged by DiskCache and each worker keeps its most recent trips in memory
+TRIP_CACHE_SIZE = 256
+TRIP_CACHE_TTL = 3600
+trip_cache = DiskCache("trips", ttl_seconds=TRIP_CACHE_TTL, maxsize=TRIP_CACHE_SIZE)
+
+
+def remember_trip(trip_id: str, trip_data: Dict[str, Any]) -> None:
+    """Store a planned trip so a revision on any worker can reuse it"""
+    trip_cache.set(trip_id, trip_data)
+
+# Planning makes several slow, blocking API calls, so it runs in the threadpool instead
+# of on the event loop; this caps how many plans run at once so bursts wait their turn
+MAX_CONCURRENT_PLANS = 8
+plan_slots = asyncio.Semaphore(MAX_CONCURRENT_PLANS)
+
+
+def _static_json(content: Dict[str, Any]) -> Tuple[bytes, str]:
+    """Serialize a fixed response body once and return it with its ETag"""
+    body = orjson.dumps(content)
+    return body, f'"{hashlib.md5(body).hexdigest()}"'
+
+
+def _static_response(body: bytes, etag: str, if_none_match: Optional[str]) -> Response:
+    """Return a pre-serialized body, or 304 Not Modified if the client already has it"""
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+TIRE_OPTIONS = [
+    "700x23c (Road - Narrow)",
+    "700x25c (Road - Standard)",
+    "700x28c (Road - Wide)",
+    "700x32c (Gravel - Narrow)",
+    "700x35c (Gravel - Standard)",
+    "700x40c (Gravel - Wide)",
+    "650b x 47mm (Gravel+)",
+    "650b x 2.1in (Mountain - XC)",
+    "650b x 2.25in (Mountain - Trail)",
+    "650b x 2.35in (Mountain - All Mountain)",
+    "26\" x 2.1in (Mountain - XC)",
+    "26\" x 2.25in (Mountain - Trail)",
+    "29\" x 2.1in (Mountain - XC)",
+    "29\" x 2.25in (Mountain - Trail)",
+    "29\" x 2.35in (Mountain - All Mountain)"
+]
+
+# These never change while the server runs, so they are serialized once at import
+DEFAULT_PROFILE_BODY, DEFAULT_PROFILE_ETAG = _static_json({"success": True, "profile": create_default_profile()})
+TIRE_OPTIONS_BODY, TIRE_OPTIONS_ETAG = _static_json({"tire_options": TIRE_OPTIONS})
 
 
 @app.on_event("startup")
@@ -122,13 +181,9 @@ async def health_check():
 
 
 @app.get("/api/default-profile")
-async def get_default_profile():
+async def get_default_profile(if_none_match: Optional[str] = Header(None)):
     """Get default user profile"""
-    try:
-        profile = create_default_profile()
-        return {"success": True, "profile": profile}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return _static_response(DEFAULT_PROFILE_BODY, DEFAULT_PROFILE_ETAG, if_none_match)
 
 
 @app.post("/api/save-profile")
@@ -136,7 +191,7 @@ async def save_user_profile(request: ProfileRequest):
     """Save user profile"""
     try:
         # Convert preferences to dict
-        preferences_dict = request.preferences.dict()
+        preferences_dict = request.preferences.model_dump()
 
         # Save profile (this would typically go to a database)
         profile_data = {
@@ -151,6 +206,35 @@ async def save_user_profile(request: ProfileRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _plan_route_blocking(
+    request: TripPlanRequest, preferences: Dict[str, Any], openai_key: str, google_maps_key: str
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Run the blocking itinerary and directions steps; returns (itinerary, directions)"""
+    # Step 1: Plan the itinerary (with API keys)
+    itinerary = plan_tour_itinerary_with_keys(
+        start=request.start_location,
+        end=request.end_location,
+        nights=request.nights,
+        preferences=preferences,
+        desires=request.desires,
+        departure_date=request.departure_date,
+        openai_key=openai_key,
+        google_maps_key=google_maps_key
+    )
+
+    # Step 2: Get route directions (with API keys)
+    directions = get_multi_waypoint_directions_with_keys(
+        itinerary, 
+        google_maps_key=google_maps_key
+    )
+
+    if not directions or 'legs' not in directions:
+        raise HTTPException(
+            status_code=400, detail="Could not find a bicycle route between the specified locations")
+
+    return itinerary, directions
+
+
 @app.post("/api/plan-trip", response_model=TripPlanResponse)
 async def plan_trip(
     request: TripPlanRequest, 
@@ -171,71 +255,58 @@ async def plan_trip(
             )
 
         # Convert preferences to dict format expected by planner
-        preferences = request.preferences.dict()
+        preferences = request.preferences.model_dump()
 
-        # Step 1: Plan the itinerary (with API keys)
-        itinerary = plan_tour_itinerary_with_keys(
-            start=request.start_location,
-            end=request.end_location,
-            nights=request.nights,
-            preferences=preferences,
-            desires=request.desires,
-            departure_date=request.departure_date,
-            openai_key=openai_key,
-            google_maps_key=google_maps_key
-        )
-
-        # Step 2: Get route directions (with API keys)
-        directions = get_multi_waypoint_directions_with_keys(
-            itinerary, 
-            google_maps_key=google_maps_key
-        )
-
-        if not directions or 'legs' not in directions:
-            raise HTTPException(
-                status_code=400, detail="Could not find a bicycle route between the specified locations")
-
-        # Step 3: Generate detailed trip plan (with API keys)
-        trip_plan = generate_trip_plan_with_keys(
-            start=request.start_location,
-            end=request.end_location,
-            nights=request.nights,
-            preferences=preferences,
-            itinerary=itinerary,
-            directions=directions,
-            departure_date=request.departure_date,
-            openai_key=openai_key
-        )
+        async with plan_slots:
+            itinerary, directions = await run_in_threadpool(
+                _plan_route_blocking, request, preferences, openai_key, google_maps_key
+            )
 
-        # Step 4: Create GeoJSON
-        geojson_data = create_geojson_with_keys(
-            start=request.start_location,
-            end=request.end_location,
-            directions=directions,
-            preferences=preferences,
-            trip_plan=trip_plan,
-            itinerary=itinerary,
-            google_maps_key=google_maps_key
-        )
+            # Steps 3 and 4: the GeoJSON only needs the route, so build it while the
+            # detailed trip plan is being written
+            trip_plan, geojson_data = await asyncio.gather(
+                run_in_threadpool(
+                    generate_trip_plan_with_keys,
+                    start=request.start_location,
+                    end=request.end_location,
+                    nights=request.nights,
+                    preferences=preferences,
+                    itinerary=itinerary,
+                    directions=directions,
+                    departure_date=request.departure_date,
+                    openai_key=openai_key
+                ),
+                run_in_threadpool(
+                    create_geojson_with_keys,
+                    start=request.start_location,
+                    end=request.end_location,
+                    directions=directions,
+                    preferences=preferences,
+                    trip_plan="",
+                    itinerary=itinerary,
+                    google_maps_key=google_maps_key
+                ),
+            )
 
         # Calculate total distance
-        total_distance = sum(leg['distance']['value'] for leg in directions['legs']) / 1000
+        total_distance, _ = route_totals(directions)
 
         # Store in cache for potential revisions
         trip_id = f"{request.start_location}_{request.end_location}_{request.nights}_{datetime.now().timestamp()}"
-        trip_cache[trip_id] = {
-            "request": request,
+        await run_in_threadpool(remember_trip, trip_id, {
+            "request": request.model_dump(),
             "itinerary": itinerary,
             "directions": directions,
             "trip_plan": trip_plan
-        }
+        })
 
         return TripPlanResponse(
             success=True,
             trip_plan=trip_plan,
             itinerary=itinerary,
             geojson=geojson_data,
-            total_distance=total_distance
+            total_distance=total_distance,
+            trip_id=trip_id
         )
 
     except Exception as e:
@@ -245,17 +316,17 @@ async def plan_trip(
         )
 
 
-@app.post("/api/revise-trip", response_model=TripPlanResponse)
-async def revise_trip(request: TripRevisionRequest):
-    """Revise a trip plan based on user feedback"""
-    try:
-        # Convert preferences to dict format
-        preferences = request.trip_request.preferences.dict()
-
-        # For this demo, we'll need to re-plan since we don't have the original data
-        # In production, you'd store and retrieve the original itinerary and directions
-
-        # Re-plan the itinerary first
+def _revise_trip_blocking(
+    request: TripRevisionRequest, preferences: Dict[str, Any], cached_trip: Optional[Dict[str, Any]]
+) -> Tuple[Dict[str, Any], Dict[str, Any], str, Dict[str, Any]]:
+    """Run the blocking revision pipeline; returns (itinerary, directions, revised_plan, geojson)"""
+    if cached_trip:
+        itinerary = cached_trip["itinerary"]
+        directions = cached_trip["directions"]
+    else:
+        # The trip expired, was planned by a client that sent no trip_id, or the caches
+        # are disabled (DIRTGENIE_DISABLE_CACHE), so re-plan it; the planner's response
+        # caches usually make this cheap
         itinerary = plan_tour_itinerary(
             start=request.trip_request.start_location,
             end=request.trip_request.end_location,
@@ -268,38 +339,57 @@ async def revise_trip(request: TripRevisionRequest):
         # Get route directions
         directions = get_multi_waypoint_directions(itinerary)
 
-        # Generate revised trip plan
-        revised_plan = revise_trip_plan_with_feedback(
-            original_plan=request.original_plan,
-            feedback=request.feedback,
-            start=request.trip_request.start_location,
-            end=request.trip_request.end_location,
-            nights=request.trip_request.nights,
-            preferences=preferences,
-            itinerary=itinerary,
-            directions=directions,
-            departure_date=request.trip_request.departure_date
-        )
+    # Generate revised trip plan
+    revised_plan = revise_trip_plan_with_feedback(
+        original_plan=request.original_plan,
+        feedback=request.feedback,
+        start=request.trip_request.start_location,
+        end=request.trip_request.end_location,
+        nights=request.trip_request.nights,
+        preferences=preferences,
+        itinerary=itinerary,
+        directions=directions,
+        departure_date=request.trip_request.departure_date
+    )
+
+    # Create updated GeoJSON
+    geojson_data = create_geojson(
+        start=request.trip_request.start_location,
+        end=request.trip_request.end_location,
+        directions=directions,
+        preferences=preferences,
+        trip_plan=revised_plan,
+        itinerary=itinerary
+    )
+
+    return itinerary, directions, revised_plan, geojson_data
 
-        # Create updated GeoJSON
-        geojson_data = create_geojson(
-            start=request.trip_request.start_location,
-            end=request.trip_request.end_location,
-            directions=directions,
-            preferences=preferences,
-            trip_plan=revised_plan,
-            itinerary=itinerary
-        )
+
+@app.post("/api/revise-trip", response_model=TripPlanResponse)
+async def revise_trip(request: TripRevisionRequest):
+    """Revise a trip plan based on user feedback"""
+    try:
+        # Convert preferences to dict format
+        preferences = request.trip_request.preferences.model_dump()
+
+        # Reuse the original itinerary and directions if the trip is still in the shared store
+        cached_trip = await run_in_threadpool(trip_cache.get, request.trip_id) if request.trip_id else None
+
+        async with plan_slots:
+            itinerary, directions, revised_plan, geojson_data = await run_in_threadpool(
+                _revise_trip_blocking, request, preferences, cached_trip
+            )
 
         # Calculate total distance
-        total_distance = sum(leg['distance']['value'] for leg in directions['legs']) / 1000
+        total_distance, _ = route_totals(directions)
 
         return TripPlanResponse(
             success=True,
             trip_plan=revised_plan,
             itinerary=itinerary,
             geojson=geojson_data,
-            total_distance=total_distance
+            total_distance=total_distance,
+            trip_id=request.trip_id if cached_trip else None
         )
 
     except Exception as e:
@@ -310,27 +400,9 @@ async def revise_trip(request: TripRevisionRequest):
 
 
 @app.get("/api/tire-options")
-async def get_tire_options():
+async def get_tire_options(if_none_match: Optional[str] = Header(None)):
     """Get available tire size options"""
-    return {
-        "tire_options": [
-            "700x23c (Road - Narrow)",
-            "700x25c (Road - Standard)",
-            "700x28c (Road - Wide)",
-            "700x32c (Gravel - Narrow)",
-            "700x35c (Gravel - Standard)",
-            "700x40c (Gravel - Wide)",
-            "650b x 47mm (Gravel+)",
-            "650b x 2.1in (Mountain - XC)",
-            "650b x 2.25in (Mountain - Trail)",
-            "650b x 2.35in (Mountain - All Mountain)",
-            "26\" x 2.1in (Mountain - XC)",
-            "26\" x 2.25in (Mountain - Trail)",
-            "29\" x 2.1in (Mountain - XC)",
-            "29\" x 2.25in (Mountain - Trail)",
-            "29\" x 2.35in (Mountain - All Mountain)"
-        ]
-    }
+    return _static_response(TIRE_OPTIONS_BODY, TIRE_OPTIONS_ETAG, if_none_match)
 
 
 def create_gpx_from_geojson(geojson_data: Dict[str, Any], title: str = "Bikepacking Route") -> str:
@@ -347,12 +419,11 @@ def create_gpx_from_geojson(geojson_data: Dict[str, Any], title: str = "Bikepack
   </trk>
 </gpx>"""
 
-        # Extract coordinates from the first LineString feature
-        coordinates = []
-        for feature in geojson_data['features']:
-            if feature['geometry']['type'] == 'LineString':
-                coordinates.extend(feature['geometry']['coordinates'])
-                break
+        # Use the coordinates of the first LineString feature as they are, without copying
+        route = next(
+            (feature for feature in geojson_data['features'] if feature['geometry']['type'] == 'LineString'), None
+        )
+        coordinates = route['geometry']['coordinates'] if route else []
 
         if not coordinates:
             return f"""<?xml version="1.0" encoding="UTF-8"?>
@@ -365,8 +436,13 @@ def create_gpx_from_geojson(geojson_data: Dict[str, Any], title: str = "Bikepack
   </trk>
 </gpx>"""
 
+        # Build the track points in one join; appending to a string per point is quadratic
+        track_points = "".join(
+            f'      <trkpt lat="{coord[1]}" lon="{coord[0]}"></trkpt>\n' for coord in coordinates
+        )
+
         # Create GPX content
-        gpx_content = f"""<?xml version="1.0" encoding="UTF-8"?>
+        return f"""<?xml version="1.0" encoding="UTF-8"?>
 <gpx version="1.1" creator="DirtGenie" xmlns="http://www.topografix.com/GPX/1/1">
   <metadata>
     <name>{title}</name>
@@ -377,19 +453,10 @@ def create_gpx_from_geojson(geojson_data: Dict[str, Any], title: str = "Bikepack
     <name>{title}</name>
     <type>cycling</type>
     <trkseg>
-"""
-
-        # Add track points
-        for coord in coordinates:
-            lon, lat = coord[0], coord[1]
-            gpx_content += f'      <trkpt lat="{lat}" lon="{lon}"></trkpt>\n'
-
-        gpx_content += """    </trkseg>
+{track_points}    </trkseg>
   </trk>
 </gpx>"""
 
-        return gpx_content
-
     except Exception as e:
         return f"""<?xml version="1.0" encoding="UTF-8"?>
 <gpx version="1.1" creator="DirtGenie">
@@ -412,7 +479,7 @@ async def download_trip_package(request: DownloadRequest):
         with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
             # Add GeoJSON file
             if request.geojson:
-                geojson_content = json.dumps(request.geojson, indent=2)
+                geojson_content = orjson.dumps(request.geojson, option=orjson.OPT_INDENT_2)
                 zip_file.writestr("route.geojson", geojson_content)
             
             # Add GPX file
@@ -442,11 +509,10 @@ Enjoy your adventure!
 """
             zip_file.writestr("README.txt", readme_content)
         
-        zip_buffer.seek(0)
-        
-        # Return as streaming response
-        return StreamingResponse(
-            io.BytesIO(zip_buffer.read()),
+        # The archive is already complete in memory, so send its bytes directly (with a
+        # Content-Length) rather than copying them into a second buffer to stream
+        return Response(
+            content=zip_buffer.getvalue(),
             media_type="application/zip",
             headers={"Content-Disposition": f"attachment; filename=trip-package-{datetime.now().strftime('%Y-%m-%d')}.zip"}
         )
@@ -455,6 +521,11 @@ Enjoy your adventure!
         raise HTTPException(status_code=500, detail=f"Error creating download package: {str(e)}")
 
 
+# Code fence the model sometimes wraps the whole plan in (e.g. "```markdown")
+OPENING_FENCE_RE = re.compile(r"\A```(?:[\w-]*[ \t]*\n)?")
+CLOSING_FENCE_RE = re.compile(r"\n?```\s*\Z")
+
+
 @app.post("/api/export-to-notion")
 async def export_to_notion(request: NotionExportRequest):
     """Create a shareable link that opens directly in Notion with the trip plan"""
@@ -462,13 +533,10 @@ async def export_to_notion(request: NotionExportRequest):
         # Clean up the markdown content
         clean_content = request.trip_plan
         
-        # Remove code block wrapping if present
-        if clean_content.startswith('```markdown\n'):
-            clean_content = clean_content.replace('```markdown\n', '').replace('\n```', '')
-        elif clean_content.startswith('```\n'):
-            clean_content = clean_content.replace('```\n', '').replace('\n```', '')
-        elif clean_content.startswith('```'):
-            clean_content = clean_content.replace('```', '').replace('\n```', '')
+        # Remove code block wrapping if present, leaving any code blocks inside the plan
+        opening_fence = OPENING_FENCE_RE.match(clean_content)
+        if opening_fence:
+            clean_content = CLOSING_FENCE_RE.sub("", clean_content[opening_fence.end():])
         
         # Escape content for safe HTML embedding
         import html
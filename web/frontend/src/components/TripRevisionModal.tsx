@@ -35,7 +35,8 @@ const TripRevisionModal: React.FC<TripRevisionModalProps> = ({
             const revisionRequest = {
                 original_plan: tripResponse.trip_plan,
                 feedback: feedback,
-                trip_request: tripRequest
+                trip_request: tripRequest,
+                trip_id: tripResponse.trip_id
             };
 
             const response = await dirtgenieApi.reviseTrip(revisionRequest);
@@ -24,6 +24,7 @@ export interface TripPlanResponse {
     itinerary?: any;
     geojson?: any;
     total_distance?: number;
+    trip_id?: string;
     error?: string;
 }
 
@@ -31,4 +32,5 @@ export interface TripRevisionRequest {
     original_plan: string;
     feedback: string;
     trip_request: TripPlanRequest;
+    trip_id?: string;
 }